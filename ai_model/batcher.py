@@ -0,0 +1,99 @@
+# Regroupement des requêtes concurrentes en un seul appel vectorisé au modèle
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Coalesce les lignes de features soumises en parallèle.
+
+    Chaque appel à `submit` renvoie un Future. Un thread dédié attend la
+    première ligne et vide la file : si elle est vide, la ligne part seule tout
+    de suite. Sinon il continue de collecter tant que des lignes arrivent,
+    pendant `window_ms` au plus (ou jusqu'à `max_rows` lignes), exécute
+    `predict_fn` une seule fois sur la matrice obtenue et distribue à chaque
+    appelant sa propre valeur. Une requête isolée n'attend donc jamais, et les
+    requêtes arrivées pendant un appel au modèle forment le batch suivant.
+    """
+
+    def __init__(self, predict_fn, window_ms=1.0, max_rows=64, name="batcher"):
+        self.predict_fn = predict_fn
+        self.window = window_ms / 1000.0
+        self.max_rows = max(1, int(max_rows))
+        self.name = name
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_started(self):
+        # Démarrage paresseux : les threads ne survivent pas au fork des workers gunicorn
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit(self, features):
+        """Soumet une ligne de features et renvoie un Future sur sa prédiction"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((features, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_rows:
+            # Vider d'abord ce qui est déjà en file, sans attendre
+            grew = False
+            while len(batch) < self.max_rows:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    grew = True
+                except queue.Empty:
+                    break
+            # File vide sans nouvelle ligne : partir tout de suite plutôt qu'attendre la fenêtre
+            if not grew or len(batch) >= self.max_rows:
+                break
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            futures = [future for _, future in batch]
+            try:
+                X = np.asarray([features for features, _ in batch], dtype=np.float64)
+                results = np.asarray(self.predict_fn(X)).tolist()
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            for future, value in zip(futures, results):
+                future.set_result(value)
+
+
+def batcher_from_env(predict_fn, name):
+    """Construit un MicroBatcher configuré par BATCH_WINDOW_MS / BATCH_MAX_ROWS"""
+    if os.getenv('BATCH_ENABLED', 'true').lower() not in ('1', 'true', 'yes'):
+        return None
+    return MicroBatcher(
+        predict_fn,
+        window_ms=float(os.getenv('BATCH_WINDOW_MS', '1.0')),
+        max_rows=int(os.getenv('BATCH_MAX_ROWS', '64')),
+        name=name
+    )
@@ -0,0 +1,604 @@
+# Benchmarks des chemins critiques de ai_model (service, démarrage, chargement, collecteur, entraînement)
+#
+#   python benchmark.py --output benchmarks/latest.json --baseline benchmarks/baseline.json
+#   python benchmark.py --quick --suite serving --url http://localhost:8000
+#
+# Tout tourne sur des substituts locaux : données synthétiques (graine fixe),
+# SQLite et fakeredis par défaut (BENCH_POSTGRES_URL / BENCH_REDIS_URL pour un
+# Postgres ou un Redis locaux, à réserver au benchmark : ils sont vidés). Les
+# résultats sont écrits en JSON ; avec --baseline, chaque mesure est comparée à
+# la référence et le script sort en erreur au-delà de --threshold.
+import argparse
+import asyncio
+import contextlib
+import http.client
+import io
+import json
+import logging
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from synthetic import roi_samples, training_samples, write_samples
+
+SUITES = ('serving', 'startup', 'data', 'collector', 'train')
+
+# Mesures comparées à la référence et sens de l'amélioration
+COMPARED = {"p95_ms": "lower", "rps": "higher", "seconds": "lower"}
+
+DEFAULT_THRESHOLD = float(os.getenv('BENCH_THRESHOLD', '0.2'))
+
+# Tailles par défaut / en mode --quick
+SIZES = {
+    "load_rows": ([1_000_000, 10_000_000], [100_000]),
+    "requests": (2000, 300),
+    "trades": (100_000, 10_000),
+    "train_rows": (200_000, 20_000),
+    "repeat": (3, 1),
+}
+
+BATCH_SIZE = 64
+
+
+def _size(args, name):
+    return SIZES[name][1 if args.quick else 0]
+
+
+@contextlib.contextmanager
+def _workdir(path):
+    previous = os.getcwd()
+    os.makedirs(path, exist_ok=True)
+    os.chdir(path)
+    try:
+        yield Path(path)
+    finally:
+        os.chdir(previous)
+
+
+@contextlib.contextmanager
+def _quiet(verbose=False):
+    if verbose:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+@contextlib.contextmanager
+def _env(**values):
+    previous = {key: os.environ.get(key) for key in values}
+    os.environ.update({key: str(value) for key, value in values.items()})
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def _timed(fn, repeat, setup=None):
+    """Meilleur temps et médiane de `repeat` exécutions de `fn` (`setup` hors chronomètre)"""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {"seconds": min(times), "median_seconds": statistics.median(times), "runs": repeat}
+
+
+def _latency_stats(latencies, elapsed):
+    ms = np.asarray(latencies) * 1000
+    return {
+        "requests": len(ms),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_ms": float(ms.mean()),
+        "rps": len(ms) / elapsed,
+    }
+
+
+def _run_case(results, name, fn, *args):
+    print(f"▶ {name}", flush=True)
+    try:
+        results[name] = fn(*args)
+    except Exception as e:
+        results[name] = {"error": str(e)}
+        print(f"  ❌ {e}")
+        return
+    print("  " + ", ".join(f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}"
+                           for k, v in results[name].items()))
+
+
+# Service d'inférence
+
+def _payloads(n, seed):
+    """Corps JSON des endpoints : vecteurs distincts pour ne pas mesurer le cache"""
+    rng = np.random.default_rng(seed)
+    rows = roi_samples(n * BATCH_SIZE, rng)[["time_since_launch", "holders", "volatility", "creator_score"]]
+    rows = rows.to_numpy().tolist()
+    return {
+        "predict": [json.dumps({"features": row}).encode() for row in rows[:n]],
+        "exit": [json.dumps({"features": [row[0], row[3] * 2, row[3] / 100, row[3]]}).encode() for row in rows[:n]],
+        "batch_predict": [json.dumps({"features": rows[i * BATCH_SIZE:(i + 1) * BATCH_SIZE]}).encode()
+                          for i in range(n)],
+    }
+
+
+def _serve_models(path, args):
+    """Entraîne des modèles de petite taille pour le service (sauf MODEL_DIR fourni)"""
+    import exit_predictor
+    import train_model
+
+    with _workdir(path), _quiet(args.verbose):
+        os.makedirs("models", exist_ok=True)
+        write_samples("roi", "roi.jsonl", 20_000, seed=args.seed)
+        write_samples("exit", "exit.jsonl", 20_000, seed=args.seed)
+        with _env(TRAINING_DATA_PATH="roi.jsonl"):
+            train_model.train()
+        with _env(TRAINING_DATA_PATH="exit.jsonl"):
+            exit_predictor.train()
+    return Path(path) / "models"
+
+
+def _inprocess_case(handle_request, endpoint, bodies, concurrency):
+    latencies = []
+    lock = threading.Lock()
+    queue = iter(bodies)
+
+    def worker():
+        local = []
+        while True:
+            with lock:
+                body = next(queue, None)
+            if body is None:
+                break
+            start = time.perf_counter()
+            _, status, _ = handle_request(endpoint, body, 'application/json', lean=True)
+            local.append(time.perf_counter() - start)
+            if status != 200:
+                raise RuntimeError(f"/{endpoint} a répondu {status}")
+        latencies.extend(local)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    return _latency_stats(latencies, time.perf_counter() - start)
+
+
+def _http_case(url, endpoint, bodies, concurrency):
+    import aiohttp
+
+    async def run():
+        latencies = []
+        queue = iter(bodies)
+        headers = {'Content-Type': 'application/json', 'X-Response-Mode': 'lean'}
+
+        async def worker(session):
+            for body in queue:
+                start = time.perf_counter()
+                async with session.post(f"{url.rstrip('/')}/{endpoint}", data=body, headers=headers) as response:
+                    await response.read()
+                    if response.status != 200:
+                        raise RuntimeError(f"/{endpoint} a répondu {response.status}")
+                latencies.append(time.perf_counter() - start)
+
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            start = time.perf_counter()
+            await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+            return _latency_stats(latencies, time.perf_counter() - start)
+
+    return asyncio.run(run())
+
+
+def bench_serving(results, args, tmp):
+    """Latence et débit de /predict, /exit et /batch_predict par niveau de concurrence.
+
+    Sans --url, les requêtes passent par inference.handle_request (décodage,
+    scoring, encodage communs à serve.py et serve_asgi.py) dans un pool de
+    threads ; avec --url, par HTTP vers un service déjà lancé.
+    """
+    n = args.requests or _size(args, "requests")
+    payloads = _payloads(n, args.seed)
+    target = args.url
+
+    if target is None:
+        # Le cache est désactivé sauf demande explicite : on mesure le modèle
+        os.environ.setdefault('PREDICTION_CACHE_SIZE', '0')
+        os.environ.setdefault('MODEL_POLL_INTERVAL', '0')
+        if not os.getenv('MODEL_DIR'):
+            os.environ['MODEL_DIR'] = str(_serve_models(tmp / "serving", args))
+        import inference
+        # Les modèles sont chargés en arrière-plan (MODEL_LOAD_ASYNC)
+        if not inference.REGISTRY.ready.wait(120):
+            raise RuntimeError("modèles non chargés après 120s")
+        handle_request = inference.handle_request
+        # Échauffement hors mesure (premiers appels des modèles et du batcher)
+        for endpoint, bodies in payloads.items():
+            for body in bodies[:50]:
+                handle_request(endpoint, body, 'application/json', lean=True)
+
+    for endpoint in ("predict", "exit", "batch_predict"):
+        for concurrency in args.concurrency:
+            name = f"serving.{endpoint}.c{concurrency}"
+            if target is None:
+                _run_case(results, name, _inprocess_case, handle_request, endpoint, payloads[endpoint], concurrency)
+            else:
+                _run_case(results, name, _http_case, target, endpoint, payloads[endpoint], concurrency)
+
+
+# Démarrage à froid du service
+
+STARTUP_COMMANDS = {
+    "asgi": lambda port: [sys.executable, '-m', 'uvicorn', 'serve_asgi:app', '--port', str(port),
+                          '--log-level', 'warning'],
+    "flask": lambda port: [sys.executable, '-c', "import serve; from werkzeug.serving import run_simple; "
+                           f"run_simple('127.0.0.1', {port}, serve.app, threaded=True)"],
+}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _poll(port, method, path, body=None, deadline=60.0):
+    """Répète la requête jusqu'à une réponse 200 ; renvoie l'instant de cette réponse"""
+    limit = time.perf_counter() + deadline
+    while time.perf_counter() < limit:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request(method, path, body, {'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            response.read()
+            connection.close()
+            if response.status == 200:
+                return time.perf_counter()
+        except OSError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"{method} {path} sans réponse 200 après {deadline:.0f}s")
+
+
+def _cold_start(server, model_dir):
+    port = _free_port()
+    env = dict(os.environ, MODEL_DIR=str(model_dir), MODEL_POLL_INTERVAL='0')
+    start = time.perf_counter()
+    process = subprocess.Popen(STARTUP_COMMANDS[server](port), cwd=Path(__file__).parent, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        live = _poll(port, 'GET', '/health/live')
+        served = _poll(port, 'POST', '/predict', b'{"features": [60, 50, 0.2, 0.8]}')
+    finally:
+        process.terminate()
+        process.wait(10)
+    return live - start, served - start
+
+
+def bench_startup(results, args, tmp):
+    """Démarrage à froid : du lancement du processus à la première réponse /health/live et /predict"""
+    model_dir = os.getenv('MODEL_DIR') or _serve_models(tmp / "startup", args)
+
+    def case(server):
+        runs = [_cold_start(server, model_dir) for _ in range(args.repeat)]
+        served = [run[1] for run in runs]
+        return {"seconds": min(served), "median_seconds": statistics.median(served),
+                "live_seconds": min(run[0] for run in runs), "runs": args.repeat}
+
+    for server in STARTUP_COMMANDS:
+        _run_case(results, f"startup.{server}", case, server)
+
+
+# Chargement des données d'entraînement
+
+def _dataset(data_dir, fmt, rows, seed):
+    """Jeu ROI synthétique mis en cache entre deux exécutions (même graine => mêmes données)"""
+    suffix = {"jsonl": ".jsonl", "parquet": "", "arrow": ".arrow"}[fmt]
+    path = Path(data_dir) / f"roi_{rows}_{seed}{suffix}"
+    if not path.exists():
+        print(f"  génération de {rows} lignes ({fmt})", flush=True)
+        write_samples("roi", str(path), rows, seed=seed, fmt=fmt)
+    return str(path)
+
+
+def bench_data(results, args, tmp):
+    """train_model.load_data sur des jeux de 1M/10M lignes, dans chaque format disponible"""
+    import train_model
+    from dataset import pa
+
+    formats = ['jsonl'] + (['parquet', 'arrow'] if pa is not None else [])
+    os.makedirs(args.data_dir, exist_ok=True)
+    for rows in args.rows or _size(args, "load_rows"):
+        for fmt in formats:
+            path = _dataset(args.data_dir, fmt, rows, args.seed)
+
+            def load(path=path, rows=rows):
+                df = train_model.load_data(path)
+                if len(df) != rows:
+                    raise RuntimeError(f"{len(df)} lignes lues sur {rows}")
+
+            def case(rows=rows, load=load):
+                timing = _timed(load, args.repeat)
+                return {**timing, "rows_per_s": rows / timing["seconds"]}
+
+            _run_case(results, f"data.load_data.{fmt}.{rows}", case)
+
+
+# Collecteur
+
+def _redis_client():
+    url = os.getenv('BENCH_REDIS_URL')
+    if url:
+        import redis
+        return redis.from_url(url)
+    import fakeredis
+    return fakeredis.FakeRedis()
+
+
+def _fill_redis(client, n, seed):
+    """Trades synthétiques au format du bot : trade JSON + sorted set `exits` par date de sortie"""
+    samples = training_samples(n, seed)
+    start = time.time() - n
+    pipe = client.pipeline(transaction=False)
+    for i, row in enumerate(samples.itertuples(index=False)):
+        sell_time = start + i
+        pipe.set(f"trade:{i}", json.dumps({
+            "token": f"mint_{i % 1000}",
+            "strategy": "bench",
+            "buy_price": 1.0,
+            "sell_price": 1.0 + row.roi,
+            "roi": row.roi,
+            "roi_per_sec": row.roi_per_sec,
+            "time_held": row.time_held,
+            "buy_time": sell_time - row.time_held,
+            "sell_time": sell_time,
+            "features": {"time_since_launch": row.time_since_launch, "volatility": row.volatility,
+                         "creator_score": row.creator_score},
+            "exit_reason": row.exit_label,
+        }))
+        pipe.zadd("exits", {f"trade:{i}": sell_time})
+        if i % 10_000 == 9_999:
+            pipe.execute()
+    pipe.execute()
+
+
+def _collector(db_url, client, output, fmt='jsonl'):
+    from data_collector import DataCollector
+
+    with _env(POSTGRES_URL=db_url, TRAINING_DATA_PATH=output):
+        collector = DataCollector(output_format=fmt)
+    collector.redis_client = client
+    return collector
+
+
+def _reset_db(db_url, db_path):
+    from data_collector import Base
+    from sqlalchemy import create_engine
+
+    if db_path is not None:
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        return
+    engine = create_engine(db_url)
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+def bench_collector(results, args, tmp):
+    """collect_trade_results (Redis -> base) puis export_training_data (base -> fichier)"""
+    from data_collector import TokenData, logger
+
+    logger.setLevel(logging.WARNING)
+    n = args.trades or _size(args, "trades")
+    db_path = None
+    db_url = os.getenv('BENCH_POSTGRES_URL')
+    if not db_url:
+        db_path = str(tmp / "collector.db")
+        db_url = f"sqlite:///{db_path}"
+    client = _redis_client()
+    output = str(tmp / "training_data.jsonl")
+    state = {}
+
+    def fresh():
+        _reset_db(db_url, db_path)
+        client.flushdb()
+        _fill_redis(client, n, args.seed)
+        state["collector"] = _collector(db_url, client, output)
+
+    def collect():
+        if not state["collector"].collect_trade_results():
+            raise RuntimeError("collect_trade_results a échoué")
+
+    def collect_case():
+        timing = _timed(collect, args.repeat, setup=fresh)
+        return {**timing, "rows_per_s": n / timing["seconds"]}
+
+    _run_case(results, f"collector.collect_trade_results.{n}", collect_case)
+    if "collector" not in state:
+        return
+
+    # Trois snapshots par mint : l'export joint chaque trade au plus récent
+    collector = state["collector"]
+    collector.bulk_insert(TokenData.__table__, [
+        {"mint": f"mint_{i % 1000}", "symbol": f"BENCH{i % 1000}", "liquidity": 1000.0, "volume": 100.0,
+         "price": 1.0, "holder_count": 50 + i, "created_at": datetime.fromtimestamp(1_700_000_000 + i),
+         "raw_data": {}}
+        for i in range(3000)
+    ])
+
+    from dataset import pa
+    for fmt in ['jsonl'] + (['parquet'] if pa is not None else []):
+        exporter = _collector(db_url, client, output, fmt)
+
+        def export(exporter=exporter):
+            if exporter.export_training_data() is None:
+                raise RuntimeError("export_training_data a échoué")
+
+        def export_case(export=export):
+            timing = _timed(export, args.repeat)
+            return {**timing, "rows_per_s": n / timing["seconds"]}
+
+        _run_case(results, f"collector.export_training_data.{fmt}.{n}", export_case)
+
+
+# Entraînement
+
+def bench_train(results, args, tmp):
+    """train() de bout en bout (chargement, ajustement, noyau, métriques) pour les deux modèles"""
+    import exit_predictor
+    import train_model
+
+    rows = args.train_rows or _size(args, "train_rows")
+    with _workdir(tmp / "train") as path:
+        os.makedirs("models", exist_ok=True)
+        write_samples("roi", "roi.jsonl", rows, seed=args.seed)
+        write_samples("exit", "exit.jsonl", rows, seed=args.seed)
+
+        def case(data, fn):
+            with _env(TRAINING_DATA_PATH=str(path / data)), _quiet(args.verbose):
+                timing = _timed(fn, args.repeat)
+            return {**timing, "rows_per_s": rows / timing["seconds"]}
+
+        _run_case(results, f"train.roi.{rows}", case, "roi.jsonl", train_model.train)
+        for backend in exit_predictor.BACKENDS:
+            _run_case(results, f"train.exit.{backend}.{rows}", case, "exit.jsonl",
+                      lambda backend=backend: exit_predictor.train(backend=backend))
+
+
+BENCHES = {
+    "serving": bench_serving,
+    "startup": bench_startup,
+    "data": bench_data,
+    "collector": bench_collector,
+    "train": bench_train,
+}
+
+
+# Résultats et comparaison
+
+def environment():
+    """Contexte de la mesure, enregistré avec les résultats"""
+    import sklearn
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Écarts relatifs aux mesures de référence ; renvoie la liste des régressions"""
+    regressions = []
+    print(f"\n{'mesure':<52} {'référence':>12} {'actuel':>12} {'écart':>8}")
+    for name, current in sorted(results.items()):
+        reference = baseline.get(name)
+        if reference is None or "error" in current or "error" in reference:
+            continue
+        for metric, better in COMPARED.items():
+            if metric not in current or metric not in reference or not reference[metric]:
+                continue
+            change = current[metric] / reference[metric] - 1
+            worse = change > threshold if better == "lower" else change < -threshold
+            flag = " ❌" if worse else ""
+            print(f"{name + '.' + metric:<52} {reference[metric]:>12.4g} {current[metric]:>12.4g} "
+                  f"{change:>+7.1%}{flag}")
+            if worse:
+                regressions.append({"name": name, "metric": metric, "baseline": reference[metric],
+                                    "current": current[metric], "change": change})
+    return regressions
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(',') if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the ai_model hot paths')
+    parser.add_argument('--suite', action='append', choices=SUITES,
+                        help='Suite to run (repeatable, default: all)')
+    parser.add_argument('--quick', action='store_true', help='Small sizes, one run per case')
+    parser.add_argument('--concurrency', type=_int_list, default=[1, 8, 32],
+                        help='Comma-separated concurrency levels for the serving suite')
+    parser.add_argument('--requests', type=int, default=None, help='Requests per serving case')
+    parser.add_argument('--url', default=None, help='Benchmark a running service instead of in-process')
+    parser.add_argument('--rows', type=_int_list, default=None, help='Comma-separated load_data sizes')
+    parser.add_argument('--trades', type=int, default=None, help='Trades for the collector suite')
+    parser.add_argument('--train-rows', type=int, default=None, help='Rows for the train suite')
+    parser.add_argument('--repeat', type=int, default=None, help='Runs per timed case (best is kept)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', default=os.getenv('BENCH_DATA_DIR', 'benchmarks/data'),
+                        help='Cache of generated datasets')
+    parser.add_argument('--output', default=None, help='Write results as JSON')
+    parser.add_argument('--baseline', default=None, help='Compare with a previous results file')
+    parser.add_argument('--save-baseline', action='store_true', help='Write results to --baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Relative change counted as a regression (default: 0.2)')
+    parser.add_argument('--verbose', action='store_true', help='Keep the trainers output')
+    args = parser.parse_args()
+    args.repeat = args.repeat or _size(args, "repeat")
+    args.data_dir = os.path.abspath(args.data_dir)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='bench_') as tmp:
+        for suite in args.suite or SUITES:
+            BENCHES[suite](results, args, Path(tmp))
+
+    report = {"environment": environment(), "settings": {k: v for k, v in vars(args).items()},
+              "results": results}
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nRésultats écrits dans {args.output}")
+
+    if args.baseline and args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Référence enregistrée dans {args.baseline}")
+    elif args.baseline:
+        if not os.path.exists(args.baseline):
+            print(f"Pas de référence {args.baseline} : comparaison ignorée")
+        else:
+            with open(args.baseline) as f:
+                regressions = compare(results, json.load(f)["results"], args.threshold)
+            if regressions:
+                print(f"\n❌ {len(regressions)} régression(s) au-delà de {args.threshold:.0%}")
+                sys.exit(1)
+            print("\n✅ Aucune régression")
+
+    if any("error" in result for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
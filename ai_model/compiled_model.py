@@ -0,0 +1,274 @@
+# Compilation des modèles entraînés en noyaux NumPy compacts pour l'inférence
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+
+from model_io import atomic_dump
+
+# Écart toléré entre le noyau compilé et sklearn lors de l'export : absolu, plus
+# relatif pour couvrir les modèles entraînés sur des données float32
+PARITY_TOLERANCE = 1e-9
+PARITY_RTOL = 1e-5
+
+
+def compile_linear(model, scaler=None):
+    """Transforme un modèle linéaire (Ridge...) en vecteur de coefficients, scaler inclus"""
+    coef = np.asarray(model.coef_, dtype=np.float64).ravel()
+    intercept = float(np.ravel(model.intercept_)[0])
+
+    if scaler is not None:
+        # coef · (x - mean) / scale + b  ==  (coef / scale) · x + (b - coef · mean / scale)
+        scale = np.asarray(scaler.scale_, dtype=np.float64) if scaler.scale_ is not None else np.ones_like(coef)
+        mean = np.asarray(scaler.mean_, dtype=np.float64) if scaler.mean_ is not None else np.zeros_like(coef)
+        coef = coef / scale
+        intercept = intercept - float(np.dot(coef, mean))
+
+    return {"kind": "linear", "coef": coef, "intercept": np.float64(intercept)}
+
+
+# Largeur de masque par nombre de feuilles (profondeur max 6 : 64 feuilles)
+MASK_DTYPES = {8: np.uint8, 16: np.uint16, 32: np.uint32, 64: np.uint64}
+
+
+# Arbre sous forme de tableaux (enfants à -1 pour une feuille, valeur par noeud)
+TreeArrays = namedtuple('TreeArrays', ['children_left', 'children_right', 'feature', 'threshold', 'value',
+                                       'missing_right'])
+
+
+def _sklearn_tree(tree):
+    return TreeArrays(tree.children_left, tree.children_right, tree.feature, tree.threshold,
+                      tree.value[:, 0, 0], np.zeros(tree.node_count, dtype=bool))
+
+
+def _hgb_tree(predictor):
+    nodes = predictor.nodes
+    if nodes['is_categorical'].any():
+        raise ValueError("HistGradientBoosting models with categorical splits cannot be compiled")
+    leaf = nodes['is_leaf'].astype(bool)
+    return TreeArrays(
+        np.where(leaf, -1, nodes['left'].astype(np.intp)), np.where(leaf, -1, nodes['right'].astype(np.intp)),
+        nodes['feature_idx'], nodes['num_threshold'], nodes['value'],
+        ~nodes['missing_go_to_left'].astype(bool)
+    )
+
+
+def _heap_layout(tree, depth, scale):
+    """Place un arbre (TreeArrays) dans un arbre binaire complet stocké en tas.
+
+    Les feuilles atteintes avant `depth` sont répliquées sur tout leur sous-arbre
+    et leurs noeuds de remplissage ont un seuil infini (toujours à gauche).
+    """
+    n_internal = 2 ** depth - 1
+    feature = np.zeros(n_internal, dtype=np.intp)
+    threshold = np.full(n_internal, np.inf, dtype=np.float64)
+    value = np.zeros(2 ** depth, dtype=np.float64)
+    missing_right = np.zeros(n_internal, dtype=bool)
+
+    stack = [(0, 0, 0)]
+    while stack:
+        node, pos, level = stack.pop()
+        if tree.children_left[node] != -1:
+            feature[pos] = tree.feature[node]
+            threshold[pos] = tree.threshold[node]
+            missing_right[pos] = tree.missing_right[node]
+            stack.append((tree.children_left[node], 2 * pos + 1, level + 1))
+            stack.append((tree.children_right[node], 2 * pos + 2, level + 1))
+        else:
+            first = last = pos
+            for _ in range(depth - level):
+                first, last = 2 * first + 1, 2 * last + 2
+            value[first - n_internal:last - n_internal + 1] = tree.value[node] * scale
+
+    return feature, threshold, value, missing_right
+
+
+def _left_leaf_masks(depth):
+    """Masque des feuilles du sous-arbre gauche de chaque noeud interne du tas"""
+    n_internal = 2 ** depth - 1
+    masks = []
+    for pos in range(n_internal):
+        level = int(np.log2(pos + 1))
+        first = last = 2 * pos + 1
+        for _ in range(depth - level - 1):
+            first, last = 2 * first + 1, 2 * last + 2
+        bits = 0
+        for leaf in range(first - n_internal, last - n_internal + 1):
+            bits |= 1 << leaf
+        masks.append(bits)
+    return masks
+
+
+def _compile_trees(trees, depth, scale, init, backend, float32_inputs):
+    n_leaves = 2 ** depth
+    mask_width = next((w for w in sorted(MASK_DTYPES) if w >= n_leaves), None)
+    if mask_width is None:
+        raise ValueError(f"Trees of depth {depth} are too deep to compile (max 6)")
+
+    layouts = [_heap_layout(tree, depth, scale) for tree in trees]
+    masks = np.array(_left_leaf_masks(depth), dtype=MASK_DTYPES[mask_width])
+    missing_right = np.concatenate([layout[3] for layout in layouts])
+
+    artifact = {
+        "kind": "gbm",
+        "backend": backend,
+        "feature": np.concatenate([layout[0] for layout in layouts]),
+        "threshold": np.concatenate([layout[1] for layout in layouts]),
+        "value": np.concatenate([layout[2] for layout in layouts]),
+        "left_masks": np.tile(masks, len(trees)),
+        "n_trees": np.int64(len(trees)),
+        "depth": np.int64(depth),
+        "init": np.float64(init),
+        "float32_inputs": float32_inputs,
+    }
+    if missing_right.any():
+        artifact["missing_right"] = missing_right
+    return artifact
+
+
+def compile_gbm(model):
+    """Aplatit un GradientBoostingClassifier binaire en tableaux seuils/features/feuilles"""
+    if model.estimators_.shape[1] != 1:
+        raise ValueError("Only binary GradientBoostingClassifier models can be compiled")
+
+    trees = [_sklearn_tree(est.tree_) for est in model.estimators_[:, 0]]
+    depth = max(1, max(est.tree_.max_depth for est in model.estimators_[:, 0]))
+    init = float(model._raw_predict_init(np.zeros((1, model.n_features_in_)))[0, 0])
+    # sklearn évalue ces arbres en float32
+    return _compile_trees(trees, depth, model.learning_rate, init, "gbm", float32_inputs=True)
+
+
+def compile_hgb(model):
+    """Aplatit un HistGradientBoostingClassifier binaire (valeurs des feuilles déjà réduites)"""
+    if any(len(predictors) != 1 for predictors in model._predictors):
+        raise ValueError("Only binary HistGradientBoostingClassifier models can be compiled")
+
+    predictors = [predictors[0] for predictors in model._predictors]
+    trees = [_hgb_tree(predictor) for predictor in predictors]
+    depth = max(1, max(int(predictor.nodes['depth'].max()) for predictor in predictors))
+    init = float(np.ravel(model._baseline_prediction)[0])
+    # Les seuils des histogrammes sont comparés en float64
+    return _compile_trees(trees, depth, 1.0, init, "hgb", float32_inputs=False)
+
+
+def compile_exit_model(model):
+    """compile_gbm ou compile_hgb selon le type du modèle"""
+    if hasattr(model, '_predictors'):
+        return compile_hgb(model)
+    return compile_gbm(model)
+
+
+class LinearKernel:
+    """Prédiction linéaire : un produit matrice-vecteur"""
+
+    def __init__(self, artifact):
+        self.coef = np.asarray(artifact["coef"], dtype=np.float64)
+        self.intercept = float(artifact["intercept"])
+
+    def predict(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.coef + self.intercept
+
+
+class TreeEnsembleKernel:
+    """Évalue tous les arbres d'un coup (masques de feuilles, façon QuickScorer).
+
+    Toutes les comparaisons seuil/feature sont faites en une opération ; chaque
+    noeud qui part à droite élimine les feuilles de son sous-arbre gauche, et la
+    feuille atteinte est le bit restant le plus faible. Renvoie P(classe 1).
+    """
+
+    def __init__(self, artifact):
+        self.feature = np.asarray(artifact["feature"])
+        self.threshold = np.asarray(artifact["threshold"])[:, None]
+        self.value = np.asarray(artifact["value"])
+        self.left_masks = np.asarray(artifact["left_masks"])[:, None]
+        self.n_trees = int(artifact["n_trees"])
+        self.depth = int(artifact["depth"])
+        self.init = float(artifact["init"])
+        self.backend = str(artifact.get("backend", "gbm"))
+        # Anciens artefacts : arbres GradientBoosting, évalués en float32
+        self.float32_inputs = bool(artifact.get("float32_inputs", True))
+        missing_right = artifact.get("missing_right")
+        self.missing_right = np.asarray(missing_right)[:, None] if missing_right is not None else None
+        self.leaf_offsets = (np.arange(self.n_trees, dtype=np.intp) * (2 ** self.depth))[:, None]
+
+    def raw_predict(self, X):
+        # GradientBoosting évalue les arbres en float32 : même arrondi pour la parité.
+        # Disposition (noeuds, lignes) : les gathers copient des lignes contiguës.
+        if self.float32_inputs:
+            X = np.asarray(X, dtype=np.float32).T.astype(np.float64)
+        else:
+            X = np.ascontiguousarray(np.asarray(X, dtype=np.float64).T)
+        values = X.take(self.feature, axis=0)
+        go_right = values > self.threshold
+        if self.missing_right is not None:
+            # HistGradientBoosting : valeur manquante envoyée à droite sur certains noeuds
+            go_right |= np.isnan(values) & self.missing_right
+        remaining = (~(go_right * self.left_masks)).reshape(self.n_trees, 2 ** self.depth - 1, -1)
+        leaves = remaining[:, 0]
+        for j in range(1, remaining.shape[1]):
+            leaves = leaves & remaining[:, j]
+        # Indice du bit le plus faible = feuille la plus à gauche encore possible
+        lowest = leaves & (~leaves + 1)
+        leaf = np.log2(lowest.astype(np.float64)).astype(np.intp)
+        return self.init + self.value.take(leaf + self.leaf_offsets).sum(axis=0)
+
+    def predict(self, X):
+        return 1.0 / (1.0 + np.exp(-self.raw_predict(X)))
+
+
+KERNELS = {"linear": LinearKernel, "gbm": TreeEnsembleKernel}
+
+
+def kernel_from_artifact(artifact):
+    """Instancie le noyau correspondant à un artefact compilé"""
+    return KERNELS[str(artifact["kind"])](artifact)
+
+
+def load_kernel(path, mmap_mode=None):
+    """Charge un artefact compilé depuis le disque"""
+    from joblib import load
+    return kernel_from_artifact(load(path, mmap_mode=mmap_mode))
+
+
+def verify_parity(artifact, reference_predict, X):
+    """Vérifie que le noyau reproduit sklearn sur X, lève ValueError sinon"""
+    expected = np.asarray(reference_predict(X), dtype=np.float64)
+    actual = kernel_from_artifact(artifact).predict(np.asarray(X, dtype=np.float64))
+    error = np.abs(actual - expected)
+    max_error = float(np.max(error)) if len(expected) else 0.0
+    if np.any(error > PARITY_TOLERANCE + PARITY_RTOL * np.abs(expected)):
+        raise ValueError(f"Compiled {artifact['kind']} kernel diverges from sklearn (max error {max_error:.3g})")
+    return max_error
+
+
+def build_kernel(compile, reference_predict, X_check):
+    """Compile le modèle et vérifie la parité sur X_check, avant toute écriture.
+
+    Renvoie l'artefact, ou None si le modèle n'est pas compilable (profondeur,
+    divergence) : le service utilisera alors le modèle sklearn.
+    """
+    try:
+        artifact = compile()
+        max_error = verify_parity(artifact, reference_predict, X_check)
+    except ValueError as e:
+        print(f"⚠️ Noyau non compilé, repli sur sklearn : {e}")
+        return None
+    kind = f"{artifact['kind']}/{artifact['backend']}" if "backend" in artifact else artifact['kind']
+    print(f"Noyau {kind} compilé (écart max vs sklearn: {max_error:.2e})")
+    return artifact
+
+
+def write_kernel(artifact, path):
+    """Écrit l'artefact compilé ; sans artefact, supprime le noyau du modèle précédent.
+
+    Le service préfère le noyau au modèle sklearn : un noyau périmé laissé en
+    place servirait l'ancien modèle.
+    """
+    path = Path(path)
+    if artifact is None:
+        if path.exists():
+            path.unlink()
+            print(f"Ancien noyau {path} supprimé")
+        return None
+    return atomic_dump(artifact, path)
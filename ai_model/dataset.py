@@ -0,0 +1,263 @@
+# Chargement des données d'entraînement en flux, colonne par colonne
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as pa_dataset
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow est optionnel : seul le format JSONL est alors disponible
+    pa = None
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+# Formats d'export/lecture ; parquet = répertoire partitionné par date (date=YYYY-MM-DD/)
+FORMATS = ('jsonl', 'parquet', 'arrow')
+
+
+def _iter_chunks(f, chunk_size):
+    chunk = []
+    for line in f:
+        if line.strip():
+            chunk.append(line)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def _parse_chunk(lines):
+    """Parse un bloc de lignes JSON en un seul appel ; ligne par ligne si le bloc est invalide"""
+    try:
+        records = json.loads('[' + ','.join(lines) + ']')
+        if all(isinstance(record, dict) for record in records):
+            return records, 0
+    except json.JSONDecodeError:
+        pass
+
+    records = []
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(record, dict):
+            records.append(record)
+    return records, len(lines) - len(records)
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _column(records, column):
+    try:
+        return np.fromiter((record.get(column, np.nan) for record in records), np.float32, len(records))
+    except (TypeError, ValueError):
+        # Valeur nulle ou non numérique : conversion tolérante
+        return np.array([_to_float(record.get(column)) for record in records], dtype=np.float32)
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("pyarrow is required for columnar (parquet/arrow) training data")
+
+
+def detect_format(path):
+    """Devine le format d'un jeu de données d'après son chemin"""
+    path = str(path)
+    if path.endswith(('.arrow', '.feather', '.ipc')):
+        return 'arrow'
+    if path.endswith('.parquet') or os.path.isdir(path):
+        return 'parquet'
+    return 'jsonl'
+
+
+def columnar_path(path, fmt):
+    """Chemin de sortie d'un format donné à partir du chemin JSONL configuré"""
+    if fmt == 'jsonl':
+        return path
+    stem = os.path.splitext(path)[0] if path.endswith('.jsonl') else path
+    return stem + '.arrow' if fmt == 'arrow' else stem
+
+
+def _load_columnar(path, columns):
+    _require_pyarrow()
+    if detect_format(path) == 'arrow':
+        # Fichier IPC mappé en mémoire : pas de copie avant la conversion en float32
+        with pa.memory_map(str(path)) as source:
+            table = pa.ipc.open_file(source).read_all()
+    else:
+        table = pa_dataset.dataset(str(path), format='parquet', partitioning='hive')
+        available = [c for c in columns if c in table.schema.names]
+        table = table.to_table(columns=available)
+
+    return pd.DataFrame({
+        column: table.column(column).to_numpy(zero_copy_only=False).astype(np.float32)
+        for column in columns
+        if column in table.column_names and table.column(column).null_count < table.num_rows
+    })
+
+
+class TrainingDataWriter:
+    """Écrit un jeu de données bloc par bloc (JSONL, Parquet partitionné ou Arrow IPC).
+
+    Les blocs sont ajoutés dans un chemin temporaire qui ne remplace `path`
+    qu'à la fermeture sans erreur : les entraîneurs ne lisent jamais un export
+    à moitié écrit. En colonnaire, le schéma est fixé par le premier bloc
+    (entiers promus en float64, colonnes vides en texte) pour que tous les
+    blocs restent compatibles.
+    """
+
+    def __init__(self, path, fmt='jsonl', partition_col='date'):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown training data format: {fmt}")
+        if fmt != 'jsonl':
+            _require_pyarrow()
+        self.path = str(path)
+        self.fmt = fmt
+        self.partition_col = partition_col
+        self.tmp_path = f"{self.path}.tmp"
+        self.rows = 0
+        self._file = None
+        self._writer = None
+        self._schema = None
+        self._parts = 0
+        self._remove(self.tmp_path)
+
+    @staticmethod
+    def _remove(path):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def _table(self, df):
+        if self._schema is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            self._schema = pa.schema([
+                field.with_type(pa.float64()) if pa.types.is_integer(field.type) else
+                field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                for field in table.schema
+            ])
+        return pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+
+    def write(self, df):
+        if not len(df):
+            return
+        if self.fmt == 'jsonl':
+            if self._file is None:
+                self._file = open(self.tmp_path, 'w')
+            df.to_json(self._file, orient='records', lines=True, double_precision=15)
+        elif self.fmt == 'arrow':
+            table = self._table(df)
+            if self._writer is None:
+                self._file = pa.OSFile(self.tmp_path, 'wb')
+                self._writer = pa.ipc.new_file(self._file, self._schema)
+            self._writer.write_table(table)
+        else:
+            partition_cols = [self.partition_col] if self.partition_col in df.columns else None
+            pq.write_to_dataset(self._table(df), self.tmp_path, partition_cols=partition_cols,
+                                basename_template=f"part-{self._parts}-{{i}}.parquet")
+            self._parts += 1
+        self.rows += len(df)
+
+    def close(self):
+        """Finalise l'écriture et publie le fichier"""
+        if self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+        if self._file is None and self._parts == 0:
+            # Aucun bloc : publier un jeu de données vide
+            if self.fmt == 'parquet':
+                os.makedirs(self.tmp_path, exist_ok=True)
+            else:
+                open(self.tmp_path, 'w').close()
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+        os.replace(self.tmp_path, self.path)
+        return self.path
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+        self._remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def write_columnar(df, path, fmt='parquet', partition_col='date'):
+    """Écrit un DataFrame en Parquet (partitionné par `partition_col`) ou en Arrow IPC.
+
+    L'écriture se fait dans un chemin temporaire remplacé à la fin, pour que
+    les entraîneurs ne lisent jamais un export à moitié écrit.
+    """
+    _require_pyarrow()
+    with TrainingDataWriter(path, fmt, partition_col) as writer:
+        writer.write(df)
+    return path
+
+
+def load_columns(path, columns, chunk_size=None):
+    """Charge `columns` en float32 depuis un JSONL, un répertoire Parquet ou un fichier Arrow.
+
+    Les formats colonnaires sont lus directement (projection de colonnes, pas
+    de parsing JSON).
+    """
+    if detect_format(path) != 'jsonl':
+        return _load_columnar(path, columns)
+    return _load_jsonl(path, columns, chunk_size)
+
+
+def _load_jsonl(path, columns, chunk_size=None):
+    """Lit un JSONL par blocs en ne gardant que `columns`, en float32.
+
+    Seules les colonnes demandées sont conservées (tableaux float32 par bloc),
+    les enregistrements bruts d'un bloc sont libérés avant le suivant : la
+    mémoire reste proportionnelle aux colonnes, pas au fichier. Une valeur
+    absente ou non numérique devient NaN ; une colonne absente de tout le
+    fichier n'apparaît pas dans le DataFrame renvoyé. Les lignes JSON
+    invalides sont ignorées.
+    """
+    chunk_size = chunk_size or int(os.getenv('TRAINING_CHUNK_SIZE', DEFAULT_CHUNK_SIZE))
+    parts = {column: [] for column in columns}
+    seen = set()
+    skipped = 0
+
+    with open(path) as f:
+        for lines in _iter_chunks(f, chunk_size):
+            records, invalid = _parse_chunk(lines)
+            skipped += invalid
+            for column in columns:
+                values = _column(records, column)
+                if column not in seen and not np.isnan(values).all():
+                    seen.add(column)
+                parts[column].append(values)
+            del records
+
+    if skipped:
+        print(f"Warning: Skipping {skipped} invalid JSON lines")
+
+    return pd.DataFrame({
+        column: np.concatenate(parts[column]) if parts[column] else np.empty(0, dtype=np.float32)
+        for column in columns if column in seen
+    })
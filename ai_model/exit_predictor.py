@@ -1,113 +1,176 @@
 # Modèle IA pour prédiction du point de sortie optimal
-import json
-import pandas as pd
-from sklearn.ensemble import GradientBoostingClassifier
+from sklearn.ensemble import GradientBoostingClassifier, HistGradientBoostingClassifier
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report
-from joblib import dump
+from sklearn.metrics import accuracy_score, classification_report
+from model_io import atomic_dump, update_metrics
+from model_search import add_search_arguments, search_model, search_options, search_summary
+from dataset import load_columns
+from compiled_model import build_kernel, compile_exit_model, write_kernel
+from synthetic import write_samples
+from profiling import add_profile_argument, configure as configure_profiling, stage
+import argparse
 import os
+from datetime import datetime
 from pathlib import Path
 
+FEATURES = ["time_since_buy", "roi", "roi_per_sec", "creator_score"]
+TARGET = "exit_now"
+
+# Backends : gbm (GradientBoosting exact, mono-thread) ou hgb (histogrammes,
+# multi-thread, arrêt anticipé) ; choisi par EXIT_MODEL_BACKEND ou --backend
+BACKENDS = {
+    "gbm": GradientBoostingClassifier,
+    "hgb": HistGradientBoostingClassifier,
+}
+
+# Hyperparamètres par défaut (sans --search)
+DEFAULT_PARAMS = {
+    "gbm": {"n_estimators": 200, "learning_rate": 0.1, "max_depth": 3},
+    "hgb": {"max_iter": 500, "learning_rate": 0.1, "max_depth": 4, "max_leaf_nodes": 15,
+            "early_stopping": True, "validation_fraction": 0.1, "n_iter_no_change": 20},
+}
+
+# Espaces de recherche (--search) ; max_depth <= 6 pour rester compilable
+SEARCH_SPACES = {
+    "gbm": {
+        "n_estimators": [100, 200, 400],
+        "learning_rate": [0.03, 0.05, 0.1, 0.2],
+        "max_depth": [2, 3, 4, 5],
+        "subsample": [0.8, 1.0],
+        "min_samples_leaf": [1, 5, 20],
+    },
+    "hgb": {
+        "learning_rate": [0.03, 0.05, 0.1, 0.2],
+        "max_depth": [3, 4, 5, 6],
+        "max_leaf_nodes": [7, 15, 31],
+        "min_samples_leaf": [5, 20, 50],
+        "l2_regularization": [0.0, 0.1, 1.0],
+    },
+}
+
+def n_trees(model):
+    """Nombre d'arbres effectivement construits (après arrêt anticipé pour hgb)"""
+    return int(model.n_iter_ if hasattr(model, '_predictors') else model.n_estimators_)
+
 def load_data(path=None):
-    """Charge les données d'entraînement depuis un fichier JSONL"""
+    """Charge les colonnes utiles des données d'entraînement (JSONL lu en flux)"""
     if path is None:
         path = os.getenv('TRAINING_DATA_PATH', 'training_data.jsonl')
     
     if not os.path.exists(path):
         create_example_data(path)
     
-    rows = []
-    with open(path) as f:
-        for line in f:
-            if line.strip():
-                try:
-                    rows.append(json.loads(line))
-                except json.JSONDecodeError:
-                    print(f"Warning: Skipping invalid JSON line")
-                    continue
-    
-    return pd.DataFrame(rows)
+    # roi_max_future sert à dériver exit_now quand il est absent
+    return load_columns(path, FEATURES + [TARGET, "roi_max_future"])
 
 def create_example_data(path):
     """Crée des données d'exemple pour l'entraînement de la sortie"""
-    import random
-    
     print(f"Creating example exit training data at {path}")
-    
-    with open(path, 'w') as f:
-        for i in range(1000):
-            # Générer des données réalistes
-            time_since_buy = random.uniform(10, 500)
-            roi = random.uniform(-0.5, 5.0)
-            roi_per_sec = roi / time_since_buy if time_since_buy > 0 else 0
-            creator_score = random.uniform(0.7, 1.0)
-            
-            # Déterminer si c'est le point de sortie optimal
-            # Basé sur des règles simples pour l'exemple
-            roi_max_future = roi + random.uniform(-0.1, 0.5)
-            exit_now = 1 if roi >= roi_max_future * 0.9 else 0
-            
-            data = {
-                "time_since_buy": time_since_buy,
-                "roi": roi,
-                "roi_per_sec": roi_per_sec,
-                "creator_score": creator_score,
-                "exit_now": exit_now,
-                "roi_max_future": roi_max_future
-            }
-            
-            f.write(json.dumps(data) + '\n')
+    write_samples("exit", path, 1000)
 
-def train():
-    """Entraîne le modèle de prédiction de sortie"""
-    # Charger les données
-    df = load_data()
-    
-    if len(df) < 10:
-        print("Warning: Not enough data for training. Generated example data.")
+def train(search=None, backend=None):
+    """Entraîne le modèle de prédiction de sortie.
+    
+    `backend` choisit l'implémentation (BACKENDS, EXIT_MODEL_BACKEND par
+    défaut). `search` (voir model_search.search_options) remplace
+    DEFAULT_PARAMS par une recherche ; le meilleur candidat est réentraîné
+    sur tout le jeu d'entraînement.
+    """
+    backend = backend or os.getenv('EXIT_MODEL_BACKEND', 'gbm')
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown exit model backend: {backend}")
+    
+    with stage("load"):
+        # Charger les données
         df = load_data()
     
-    # Préparer les données
-    if 'exit_now' not in df.columns:
-        # Créer la colonne cible si elle n'existe pas
-        if 'roi_max_future' in df.columns:
-            df["exit_now"] = (df["roi"] == df["roi_max_future"]).astype(int)
+        if len(df) < 10:
+            print("Warning: Not enough data for training. Generated example data.")
+            df = load_data()
+    
+        # Préparer les données
+        if 'exit_now' not in df.columns:
+            # Créer la colonne cible si elle n'existe pas
+            if 'roi_max_future' in df.columns:
+                df["exit_now"] = (df["roi"] == df["roi_max_future"]).astype(int)
+            else:
+                # Approximation : sortir si le ROI/sec diminue
+                df["exit_now"] = (df["roi_per_sec"] < df["roi_per_sec"].shift(1)).astype(int)
+    
+        # Définir les features et target
+        features = FEATURES
+        target = TARGET
+    
+        # Vérifier que toutes les features existent
+        missing_features = [f for f in features if f not in df.columns]
+        if missing_features:
+            raise ValueError(f"Missing required features: {missing_features}")
+    
+        # Lignes incomplètes ignorées
+        df = df.dropna(subset=features + [target])
+        X = df[features]
+        y = df[target].astype(int)
+    
+        # Diviser en train/test
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    
+    with stage("fit"):
+        # Entraîner le modèle
+        result = None
+        if search:
+            base = BACKENDS[backend](**{**DEFAULT_PARAMS[backend], "random_state": 42})
+            result = search_model(base, SEARCH_SPACES[backend], X_train, y_train, **search)
+            model = result["estimator"]
         else:
-            # Approximation : sortir si le ROI/sec diminue
-            df["exit_now"] = (df["roi_per_sec"] < df["roi_per_sec"].shift(1)).astype(int)
-    
-    # Définir les features et target
-    features = ["time_since_buy", "roi", "roi_per_sec", "creator_score"]
-    target = "exit_now"
-    
-    # Vérifier que toutes les features existent
-    missing_features = [f for f in features if f not in df.columns]
-    if missing_features:
-        raise ValueError(f"Missing required features: {missing_features}")
-    
-    X = df[features]
-    y = df[target]
-    
-    # Diviser en train/test
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-    # Entraîner le modèle
-    model = GradientBoostingClassifier(n_estimators=200, learning_rate=0.1, max_depth=3)
-    model.fit(X_train, y_train)
+            model = BACKENDS[backend](**DEFAULT_PARAMS[backend])
+            model.fit(X_train, y_train)
+    print(f"Backend {backend}: {n_trees(model)} arbres")
     
     # Évaluer
     y_pred = model.predict(X_test)
+    accuracy = accuracy_score(y_test, y_pred)
     print("\nClassification Report:")
     print(classification_report(y_test, y_pred))
     
-    # Sauvegarder le modèle
-    model_path = Path("models") if os.path.exists("models") else Path(".")
-    dump(model, model_path / "exit_model.joblib")
+    with stage("export"):
+        # Noyau compact (arbres aplatis) utilisé par serve.py, vérifié avant d'écrire quoi que ce soit
+        kernel = build_kernel(
+            lambda: compile_exit_model(model),
+            lambda X: model.predict_proba(X)[:, 1],
+            X_test
+        )
+    
+        # Sauvegarder le modèle
+        model_path = Path("models") if os.path.exists("models") else Path(".")
+        atomic_dump(model, model_path / "exit_model.joblib")
+        write_kernel(kernel, model_path / "exit_kernel.joblib")
+    
+        # `accuracy` (premier niveau) est lu par TrainingScheduler.check_model_performance
+        update_metrics(model_path / "metrics.json", {
+            "accuracy": float(accuracy),
+            "exit": {
+                "accuracy": float(accuracy),
+                "backend": backend,
+                "model": type(model).__name__,
+                "params": model.get_params(),
+                "n_trees": n_trees(model),
+                "n_train": len(X_train),
+                "trained_at": datetime.now().isoformat(),
+                "search": search_summary(result) if result else None
+            }
+        })
     
     print(f"✅ Modèle de sortie entraîné et sauvegardé dans {model_path}")
     
     return model
 
 if __name__ == "__main__":
-    train()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Train the exit model')
+    parser.add_argument('--backend', choices=list(BACKENDS), default=None,
+                        help='Exit model implementation (default: EXIT_MODEL_BACKEND or gbm)')
+    add_search_arguments(parser)
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    configure_profiling(args.profile, 'exit_predictor')
+    train(search=search_options(args), backend=args.backend)
\ No newline at end of file
@@ -0,0 +1,76 @@
+# Features ROI des tokens lues dans Redis (`enriched:{mint}`, écrites par solana_agent)
+#
+# Un pool de connexions borné est partagé par tous les threads du worker ;
+# une requête, quel que soit son nombre de mints, coûte un MGET par lot de
+# `batch_size` clés.
+import logging
+import os
+import threading
+
+import numpy as np
+import redis
+
+from redis_batch import DEFAULT_BATCH_SIZE, RedisBatchReader
+
+logger = logging.getLogger('feature_store')
+
+ENRICHED_PREFIX = 'enriched:'
+# Ordre du vecteur de /predict et valeurs par défaut de fetchAIScoring (agent.ts)
+ROI_FEATURES = ('time_since_launch', 'holders', 'volatility', 'creator_score')
+ROI_DEFAULTS = (60.0, 50.0, 0.2, 0.8)
+
+
+def _feature(data, name, default):
+    # Même règle que `features.x || défaut` côté agent : absente, nulle ou invalide => défaut
+    try:
+        value = float(data.get(name) or default)
+    except (TypeError, ValueError):
+        return default
+    return value if np.isfinite(value) else default
+
+
+class FeatureStore:
+    """Résout les vecteurs de features ROI de plusieurs mints en un aller-retour"""
+
+    def __init__(self, client, batch_size=DEFAULT_BATCH_SIZE):
+        self.client = client
+        self.reader = RedisBatchReader(client, batch_size)
+
+    def roi_features(self, mints):
+        """Matrice (n, 4) float64 et masque des mints trouvés dans Redis"""
+        found = self.reader.get_json([ENRICHED_PREFIX + mint for mint in mints])
+        X = np.empty((len(mints), len(ROI_FEATURES)), dtype=np.float64)
+        X[:] = ROI_DEFAULTS
+        present = np.zeros(len(mints), dtype=bool)
+        for i, mint in enumerate(mints):
+            data = found.get(ENRICHED_PREFIX + mint)
+            if isinstance(data, dict):
+                X[i] = [_feature(data, name, default) for name, default in zip(ROI_FEATURES, ROI_DEFAULTS)]
+                present[i] = True
+        return X, present
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def store_from_env():
+    """FeatureStore partagé du processus, créé au premier appel (REDIS_URL, REDIS_POOL_SIZE...)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                url = os.getenv('REDIS_URL', 'redis://redis:6379/0')
+                timeout = float(os.getenv('REDIS_TIMEOUT', '1.0'))
+                # Pool bloquant : au-delà de REDIS_POOL_SIZE, une requête attend une connexion libre
+                pool = redis.BlockingConnectionPool.from_url(
+                    url,
+                    max_connections=int(os.getenv('REDIS_POOL_SIZE', '16')),
+                    timeout=timeout,
+                    socket_timeout=timeout,
+                    socket_connect_timeout=timeout,
+                )
+                _store = FeatureStore(redis.Redis(connection_pool=pool),
+                                      int(os.getenv('REDIS_MGET_BATCH_SIZE', str(DEFAULT_BATCH_SIZE))))
+                logger.info(f"Features lues dans Redis: {url}")
+    return _store
@@ -0,0 +1,597 @@
+# Logique d'inférence partagée par le serveur Flask (serve.py) et le serveur ASGI (serve_asgi.py)
+import fcntl
+import json
+import logging
+import math
+import numpy as np
+import os
+import subprocess
+import threading
+import time
+from pathlib import Path
+from batcher import batcher_from_env
+from metrics import CONTENT_TYPE, SIZE_BUCKETS, MetricsRegistry, SeriesGroup, metrics_enabled
+from model_io import atomic_write_json
+from model_registry import ModelRegistry
+from prediction_cache import cache_from_env
+import wire
+
+logger = logging.getLogger('inference')
+
+# Registre des modèles : surveille MODEL_DIR (models/production par défaut) et
+# échange les versions à chaud. Mettre MODEL_POLL_INTERVAL=0 pour désactiver.
+REGISTRY = ModelRegistry(
+    model_dir=os.getenv('MODEL_DIR') or None,
+    poll_interval=float(os.getenv('MODEL_POLL_INTERVAL', '5')),
+    mmap_mode=os.getenv('MODEL_MMAP_MODE', 'r') or None
+)
+# Chargement et préchauffage en arrière-plan : le serveur écoute tout de suite
+# (/health/live) et les endpoints de scoring répondent 503 jusqu'à /health/ready.
+# MODEL_LOAD_ASYNC=false charge les modèles pendant l'import.
+if os.getenv('MODEL_LOAD_ASYNC', 'true').lower() in ('1', 'true', 'yes'):
+    REGISTRY.load_async()
+else:
+    REGISTRY.load()
+REGISTRY.start()
+
+# Cache des prédictions, vidé à chaque échange de modèles (la version fait aussi partie de la clé)
+CACHE = cache_from_env()
+if CACHE is not None:
+    REGISTRY.on_swap(CACHE.clear)
+
+# Instrumentation exposée sur /metrics (METRICS_ENABLED=false pour la retirer du chemin des requêtes)
+METRICS = MetricsRegistry() if metrics_enabled() else None
+STAGES = ('decode', 'score', 'encode')
+if METRICS is not None:
+    REQUEST_SECONDS = METRICS.histogram(
+        'cubi_request_duration_seconds', 'Request time from decoding to encoding', ('endpoint',))
+    STAGE_SECONDS = METRICS.histogram(
+        'cubi_request_stage_seconds', 'Request time per stage (decode, score, encode)', ('endpoint', 'stage'))
+    REQUESTS = METRICS.counter(
+        'cubi_requests_total', 'Requests by endpoint, HTTP status and model version',
+        ('endpoint', 'status', 'model_version'))
+    MODEL_SECONDS = METRICS.histogram(
+        'cubi_model_inference_seconds', 'Time per model call', ('model',))
+    MODEL_ROWS = METRICS.histogram(
+        'cubi_model_batch_rows', 'Rows per model call (micro-batches and batch endpoints), _sum = rows scored', ('model',), SIZE_BUCKETS)
+    FEATURE_SECONDS = METRICS.histogram(
+        'cubi_feature_lookup_seconds', 'Time to resolve mint features from Redis (one MGET per request)').labels()
+    METRICS.callback(
+        'cubi_model_info', 'Model version currently served', ('model_version', 'exit_backend'),
+        lambda: [((REGISTRY.current.version, getattr(REGISTRY.current.exit, 'backend', '')), 1)])
+    for _field in ('hits', 'misses'):
+        METRICS.callback(
+            f'cubi_prediction_cache_{_field}_total', f'Prediction cache {_field}', (),
+            lambda field=_field: [((), CACHE.stats()[field])] if CACHE is not None else [], type='counter')
+    # Séries résolues une fois et rangées dans un même tableau par modèle : un appel
+    # modèle ne fait qu'un accès au thread-local
+    _MODEL_SERIES = {}
+    for _model in ('roi', 'exit'):
+        _group = SeriesGroup()
+        _MODEL_SERIES[_model] = (_group, MODEL_SECONDS.grouped(_group, _model), MODEL_ROWS.grouped(_group, _model))
+
+def reload_models():
+    """Recharge immédiatement les modèles depuis le répertoire surveillé"""
+    return REGISTRY.load()
+
+def _predict(model, X):
+    bundle = REGISTRY.current
+    if METRICS is None:
+        return getattr(bundle, model).predict(X)
+    start = time.perf_counter_ns()
+    values = getattr(bundle, model).predict(X)
+    elapsed = time.perf_counter_ns() - start
+    group, seconds, rows = _MODEL_SERIES[model]
+    shard = group.shard()
+    seconds.observe_into(shard, elapsed / 1e9)
+    rows.observe_into(shard, len(X))
+    return values
+
+def predict_roi_rows(X):
+    """ROI/sec pour une matrice (n, 4)"""
+    return _predict('roi', X)
+
+def predict_exit_rows(X):
+    """Probabilité de sortie pour une matrice (n, 4)"""
+    return _predict('exit', X)
+
+# Coalescence des requêtes unitaires concurrentes (désactivable via BATCH_ENABLED=false)
+ROI_BATCHER = batcher_from_env(predict_roi_rows, "roi-batcher")
+EXIT_BATCHER = batcher_from_env(predict_exit_rows, "exit-batcher")
+
+def parse_row(features):
+    """Convertit une ligne de 4 features en floats, None si invalide ou non finie (NaN, inf)"""
+    if not isinstance(features, (list, tuple)) or len(features) != 4:
+        return None
+    try:
+        row = [float(v) for v in features]
+    except (TypeError, ValueError):
+        return None
+    return row if all(math.isfinite(v) for v in row) else None
+
+def _score_row(model, batcher, predict_rows, row):
+    if CACHE is not None:
+        key = CACHE.key(model, REGISTRY.current.version, row)
+        cached = CACHE.get(key)
+        if cached is not None:
+            return cached
+
+    if batcher is not None:
+        value = batcher.submit(row).result()
+    else:
+        value = float(predict_rows(np.asarray([row], dtype=np.float64))[0])
+
+    if CACHE is not None:
+        CACHE.put(key, value)
+    return value
+
+def _score_rows(model, predict_rows, X):
+    """Score une matrice en ne passant au modèle que les lignes absentes du cache"""
+    if CACHE is None or not len(X):
+        return predict_rows(X).tolist()
+
+    version = REGISTRY.current.version
+    keys = [CACHE.key(model, version, row) for row in X.tolist()]
+    values = [CACHE.get(key) for key in keys]
+    missing = [i for i, value in enumerate(values) if value is None]
+    if missing:
+        for i, value in zip(missing, predict_rows(X[missing]).tolist()):
+            values[i] = value
+            CACHE.put(keys[i], value)
+    return values
+
+def validate_batch(feature_list):
+    """Valide toutes les lignes d'un batch et construit une matrice NumPy unique"""
+    valid_rows = []
+    valid_idx = []
+    errors = {}
+    for i, features in enumerate(feature_list):
+        row = parse_row(features)
+        if row is None:
+            errors[i] = "Invalid features"
+            continue
+        valid_rows.append(row)
+        valid_idx.append(i)
+
+    X = np.asarray(valid_rows, dtype=np.float64).reshape(-1, 4)
+    return X, valid_idx, errors
+
+# Handlers : chacun prend le corps JSON décodé et renvoie (payload, status HTTP)
+
+def handle_health():
+    bundle = REGISTRY.current
+    return {
+        "status": "healthy",
+        "roi_model": bundle.roi is not None,
+        "exit_model": bundle.exit is not None,
+        "exit_backend": getattr(bundle.exit, 'backend', None),
+        "model_version": bundle.version,
+        "ready": REGISTRY.ready.is_set(),
+        "cache": CACHE.stats() if CACHE is not None else None
+    }, 200
+
+def handle_live():
+    """Liveness : le processus répond, modèles chargés ou non"""
+    return {"status": "alive"}, 200
+
+def handle_ready():
+    """Readiness : 503 tant que les deux modèles ne sont pas chargés et préchauffés"""
+    bundle = REGISTRY.current
+    ready = REGISTRY.ready.is_set()
+    if ready:
+        status = "ready"
+    elif REGISTRY.load_error:
+        status = "error"
+    elif REGISTRY.loading:
+        status = "loading"
+    else:
+        # Répertoire lu mais modèle ROI ou de sortie absent : en attente des fichiers
+        status = "missing_models"
+    return {
+        "status": status,
+        "roi_model": bundle.roi is not None,
+        "exit_model": bundle.exit is not None,
+        "model_version": bundle.version,
+        "load_seconds": REGISTRY.load_seconds,
+        "error": REGISTRY.load_error
+    }, 200 if ready else 503
+
+def handle_predict(data, lean=False):
+    if REGISTRY.current.roi is None:
+        return {"error": "ROI model not loaded"}, 500
+
+    try:
+        features = (data or {}).get('features', [])
+
+        # Format: [time_since_launch, holders, volatility, creator_score]
+        row = parse_row(features)
+        if row is None:
+            return {"error": "Invalid features. Expected 4 finite numbers."}, 400
+
+        prediction = _score_row('roi', ROI_BATCHER, predict_roi_rows, row)
+        if lean:
+            return {"roi_per_sec": float(prediction)}, 200
+
+        return {
+            "roi_per_sec": float(prediction),
+            "features": {
+                "time_since_launch": features[0],
+                "holders": features[1],
+                "volatility": features[2],
+                "creator_score": features[3]
+            }
+        }, 200
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+def handle_exit(data, lean=False):
+    if REGISTRY.current.exit is None:
+        return {"error": "Exit model not loaded"}, 500
+
+    try:
+        features = (data or {}).get('features', [])
+
+        # Format: [time_since_buy, roi, roi_per_sec, creator_score]
+        row = parse_row(features)
+        if row is None:
+            return {"error": "Invalid features. Expected 4 finite numbers."}, 400
+
+        # Prédiction de probabilité (classification)
+        prediction_proba = _score_row('exit', EXIT_BATCHER, predict_exit_rows, row)
+        should_exit = prediction_proba > 0.5
+        if lean:
+            return {"should_exit": bool(should_exit), "exit_probability": float(prediction_proba)}, 200
+
+        return {
+            "should_exit": bool(should_exit),
+            "exit_probability": float(prediction_proba),
+            "features": {
+                "time_since_buy": features[0],
+                "roi": features[1],
+                "roi_per_sec": features[2],
+                "creator_score": features[3]
+            }
+        }, 200
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+def handle_batch_predict(data, lean=False):
+    if REGISTRY.current.roi is None:
+        return {"error": "ROI model not loaded"}, 500
+
+    try:
+        feature_list = (data or {}).get('features', [])
+
+        X, valid_idx, errors = validate_batch(feature_list)
+
+        # Un seul appel au modèle pour tout le batch
+        predictions = [{"error": errors[i]} if i in errors else None for i in range(len(feature_list))]
+        if valid_idx:
+            roi_values = _score_rows('roi', predict_roi_rows, X)
+            for i, value in zip(valid_idx, roi_values):
+                predictions[i] = {"roi_per_sec": value}
+
+        return {"predictions": predictions}, 200
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+def handle_batch_exit(data, lean=False):
+    if REGISTRY.current.exit is None:
+        return {"error": "Exit model not loaded"}, 500
+
+    try:
+        feature_list = (data or {}).get('features', [])
+
+        X, valid_idx, errors = validate_batch(feature_list)
+
+        predictions = [{"error": errors[i]} if i in errors else None for i in range(len(feature_list))]
+        if valid_idx:
+            probabilities = _score_rows('exit', predict_exit_rows, X)
+            for i, proba in zip(valid_idx, probabilities):
+                predictions[i] = {
+                    "should_exit": proba > 0.5,
+                    "exit_probability": proba
+                }
+
+        return {"predictions": predictions}, 200
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+def _feature_store():
+    # Import différé : redis n'est chargé qu'au premier appel par mint
+    from feature_store import store_from_env
+    return store_from_env()
+
+def _resolve_mints(mints):
+    """Features ROI des mints lues dans Redis : (X, présents, réponse d'erreur ou None)"""
+    start = time.perf_counter_ns()
+    try:
+        X, present = _feature_store().roi_features(mints)
+    except Exception as e:
+        logger.error(f"Lecture des features dans Redis impossible: {e}")
+        return None, None, ({"error": f"Feature store unavailable: {e}"}, 503)
+    if METRICS is not None:
+        FEATURE_SECONDS.observe((time.perf_counter_ns() - start) / 1e9)
+    return X, present, None
+
+def handle_predict_mint(data, lean=False):
+    if REGISTRY.current.roi is None:
+        return {"error": "ROI model not loaded"}, 500
+
+    if not isinstance(data, dict):
+        return {"error": "Invalid body. Expected an object with a mint."}, 400
+    mint = data.get('mint')
+    if not isinstance(mint, str) or not mint:
+        return {"error": "Invalid mint. Expected a token address."}, 400
+
+    X, present, error = _resolve_mints([mint])
+    if error is not None:
+        return error
+    try:
+        row = X[0].tolist()
+        prediction = _score_row('roi', ROI_BATCHER, predict_roi_rows, row)
+        result = {"mint": mint, "roi_per_sec": float(prediction), "found": bool(present[0])}
+        if not lean:
+            result["features"] = dict(zip(("time_since_launch", "holders", "volatility", "creator_score"), row))
+        return result, 200
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+def handle_batch_predict_mint(data, lean=False):
+    if REGISTRY.current.roi is None:
+        return {"error": "ROI model not loaded"}, 500
+
+    if not isinstance(data, dict):
+        return {"error": "Invalid body. Expected an object with a list of mints."}, 400
+    mints = data.get('mints', [])
+    if not isinstance(mints, list):
+        return {"error": "Invalid mints. Expected a list of token addresses."}, 400
+
+    valid_idx = [i for i, mint in enumerate(mints) if isinstance(mint, str) and mint]
+    predictions = [{"error": "Invalid mint"} for _ in mints]
+    if not valid_idx:
+        return {"predictions": predictions}, 200
+
+    # Un MGET pour toute la liste, puis un seul appel au modèle
+    X, present, error = _resolve_mints([mints[i] for i in valid_idx])
+    if error is not None:
+        return error
+    try:
+        roi_values = _score_rows('roi', predict_roi_rows, X)
+        for i, value, found in zip(valid_idx, roi_values, present.tolist()):
+            predictions[i] = {"mint": mints[i], "roi_per_sec": value, "found": found}
+        return {"predictions": predictions}, 200
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+def _handle_matrix(model, X):
+    """Scoring d'une matrice float32 brute : une valeur par ligne, NaN si ligne invalide"""
+    if model == 'roi':
+        loaded, batcher, predict_rows = REGISTRY.current.roi, ROI_BATCHER, predict_roi_rows
+    else:
+        loaded, batcher, predict_rows = REGISTRY.current.exit, EXIT_BATCHER, predict_exit_rows
+    if loaded is None:
+        return {"error": f"{'ROI' if model == 'roi' else 'Exit'} model not loaded"}, 500
+
+    try:
+        valid = np.isfinite(X).all(axis=1)
+        values = np.full(len(X), np.nan)
+        if len(X) == 1 and valid[0]:
+            values[0] = _score_row(model, batcher, predict_rows, X[0].tolist())
+        elif valid.any():
+            values[valid] = _score_rows(model, predict_rows, X[valid])
+        return values, 200
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+HANDLERS = {
+    'predict': handle_predict,
+    'exit': handle_exit,
+    'batch_predict': handle_batch_predict,
+    'batch_exit': handle_batch_exit,
+    'predict_mint': handle_predict_mint,
+    'batch_predict_mint': handle_batch_predict_mint,
+}
+
+MATRIX_MODELS = {'predict': 'roi', 'batch_predict': 'roi', 'exit': 'exit', 'batch_exit': 'exit'}
+
+if METRICS is not None:
+    # Par endpoint : les trois étapes et la durée totale dans un même tableau par thread
+    _REQUEST_SERIES = {}
+    for _endpoint in HANDLERS:
+        _group = SeriesGroup()
+        _REQUEST_SERIES[_endpoint] = (_group, *(STAGE_SECONDS.grouped(_group, _endpoint, stage) for stage in STAGES),
+                                      REQUEST_SECONDS.grouped(_group, _endpoint))
+    # Compteur des réponses 200 par endpoint pour la version servie : (version, série)
+    _OK_REQUESTS = {}
+
+def _observe_request(endpoint, status, start, decoded, scored, encoded):
+    """Durées des étapes à partir des instants perf_counter_ns successifs"""
+    group, decode, score, encode, total = _REQUEST_SERIES[endpoint]
+    shard = group.shard()
+    decode.observe_into(shard, (decoded - start) / 1e9)
+    score.observe_into(shard, (scored - decoded) / 1e9)
+    encode.observe_into(shard, (encoded - scored) / 1e9)
+    total.observe_into(shard, (encoded - start) / 1e9)
+    version = REGISTRY.current.version
+    if status != 200:
+        REQUESTS.inc(endpoint, status, version)
+        return
+    cached = _OK_REQUESTS.get(endpoint)
+    if cached is None or cached[0] != version:
+        cached = _OK_REQUESTS[endpoint] = (version, REQUESTS.labels(endpoint, 200, version))
+    cached[1].inc()
+
+def handle_request(endpoint, body, content_type=None, lean=False):
+    """Point d'entrée des transports : décode, score et encode dans le format de la requête.
+
+    Renvoie (corps, status HTTP, content type).
+    """
+    if not REGISTRY.ready.is_set():
+        if METRICS is not None:
+            REQUESTS.inc(endpoint, 503, '')
+        message = "Models are loading" if REGISTRY.loading else "Models are not loaded"
+        return wire.encode({"error": message}, wire.JSON), 503, wire.JSON
+
+    start = time.perf_counter_ns()
+    try:
+        media, data = wire.decode(body, content_type)
+    except wire.WireError as e:
+        if METRICS is not None:
+            REQUESTS.inc(endpoint, e.status, REGISTRY.current.version)
+        return wire.encode({"error": str(e)}, wire.JSON), e.status, wire.JSON
+    decoded = time.perf_counter_ns()
+
+    if media == wire.FLOAT32:
+        if endpoint in MATRIX_MODELS:
+            payload, status = _handle_matrix(MATRIX_MODELS[endpoint], data)
+        else:
+            payload, status = {"error": "float32 bodies are not supported on this endpoint"}, 415
+    else:
+        payload, status = HANDLERS[endpoint](data, lean=lean)
+    scored = time.perf_counter_ns()
+
+    # Les erreurs sont toujours renvoyées en JSON
+    if status != 200 and media == wire.FLOAT32:
+        media = wire.JSON
+    encoded = wire.encode(payload, media)
+    if METRICS is not None:
+        _observe_request(endpoint, status, start, decoded, scored, time.perf_counter_ns())
+    return encoded, status, media
+
+def handle_metrics():
+    """Métriques au format texte Prometheus : (corps, status HTTP, content type)"""
+    if METRICS is None:
+        return "metrics disabled\n", 404, CONTENT_TYPE
+    return METRICS.render(), 200, CONTENT_TYPE
+
+# Réentraînement hors du chemin des requêtes : un seul job à la fois pour tous les
+# workers (verrou flock sur models/.retrain.lock, état partagé dans models/retrain_status.json)
+
+RETRAIN_DIR = Path("models")
+RETRAIN_LOCK = RETRAIN_DIR / ".retrain.lock"
+RETRAIN_STATUS = RETRAIN_DIR / "retrain_status.json"
+
+def _open_retrain_lock():
+    RETRAIN_DIR.mkdir(parents=True, exist_ok=True)
+    return os.open(RETRAIN_LOCK, os.O_RDWR | os.O_CREAT, 0o666)
+
+def _lock_retrain():
+    """Descripteur tenant le verrou exclusif de réentraînement, ou None si un job le tient"""
+    fd = _open_retrain_lock()
+    for _ in range(3):
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except BlockingIOError:
+            pass
+        # Verrou partagé possible : seules des lectures d'état le tiennent, quelques microsecondes
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except BlockingIOError:
+            break
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        time.sleep(0.001)
+    os.close(fd)
+    return None
+
+def _retrain_running():
+    """Vrai si un job (de ce worker ou d'un autre) tient le verrou exclusif"""
+    fd = _open_retrain_lock()
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        return False
+    except BlockingIOError:
+        return True
+    finally:
+        os.close(fd)
+
+def _read_retrain_state():
+    try:
+        with open(RETRAIN_STATUS) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"status": "idle"}
+
+def _write_retrain_state(state):
+    atomic_write_json(state, RETRAIN_STATUS)
+
+def _promote_retrained(trained_dir):
+    """Modèles entraînés hors du répertoire servi : staging, validation puis promotion.
+
+    Renvoie (promus, détails de validation, raison du refus).
+    """
+    from validate_model import ModelValidator
+
+    validator = ModelValidator()
+    validator.stage_models(trained_dir)
+    test_data_path = os.getenv('VALIDATION_DATA_PATH', 'test_data.csv')
+    try:
+        ok, results = validator.validate_staging(test_data_path)
+    except Exception as e:
+        return False, None, f"validation failed ({test_data_path}): {e}"
+    if not ok:
+        return False, results, "staging models do not beat production"
+    validator.promote_models()
+    return True, results, None
+
+def _run_retrain(lock_fd):
+    started = time.time()
+    try:
+        result = subprocess.run(['./train.sh'], capture_output=True, text=True)
+        if result.returncode != 0:
+            state = {"status": "error", "message": "Training failed", "error": result.stderr}
+        elif REGISTRY.model_dir.resolve() == RETRAIN_DIR.resolve():
+            # train.sh écrit directement dans le répertoire servi
+            bundle = reload_models()
+            state = {
+                "status": "success",
+                "message": "Models retrained successfully",
+                "promoted": True,
+                "model_version": bundle.version,
+                "output": result.stdout
+            }
+        else:
+            promoted, validation, reason = _promote_retrained(RETRAIN_DIR)
+            bundle = reload_models() if promoted else REGISTRY.current
+            state = {
+                "status": "success",
+                "message": "Models retrained and promoted" if promoted
+                           else f"Models retrained but not promoted: {reason}",
+                "promoted": promoted,
+                "validation": validation,
+                "model_version": bundle.version,
+                "output": result.stdout
+            }
+    except Exception as e:
+        state = {"status": "error", "message": "Training failed", "error": str(e)}
+
+    state.update(started_at=started, finished_at=time.time())
+    try:
+        _write_retrain_state(state)
+    finally:
+        # Fermer le descripteur libère le verrou
+        os.close(lock_fd)
+    logger.info(f"Réentraînement terminé: {state['message']}")
+
+def handle_retrain():
+    lock_fd = _lock_retrain()
+    if lock_fd is None:
+        return handle_retrain_status()[0], 409
+    try:
+        _write_retrain_state({"status": "running", "started_at": time.time(), "pid": os.getpid()})
+        threading.Thread(target=_run_retrain, args=(lock_fd,), name='retrain', daemon=True).start()
+    except BaseException:
+        os.close(lock_fd)
+        raise
+    return {"status": "running", "message": "Retraining started"}, 202
+
+def handle_retrain_status():
+    state = _read_retrain_state()
+    if _retrain_running():
+        # L'état « running » peut ne pas être encore écrit par le worker qui a lancé le job
+        return (state if state.get("status") == "running" else {"status": "running"}), 200
+    if state.get("status") == "running":
+        # Verrou libre mais état « running » : le worker qui portait le job est mort
+        state = {**state, "status": "error", "message": "Training interrupted"}
+    return state, 200
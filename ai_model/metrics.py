@@ -0,0 +1,297 @@
+# Métriques du service d'inférence au format texte Prometheus (sans dépendance)
+#
+# Compteurs et histogrammes à seaux fixes : une observation coûte une
+# recherche dichotomique et deux additions dans un tableau propre au thread.
+# Les séries d'un jeu de labels connu d'avance sont résolues une fois
+# (`labels(...)`) pour éviter la recherche dans le dictionnaire à chaque requête,
+# et les séries mises à jour ensemble peuvent partager un tableau (`SeriesGroup`) :
+# un seul accès au thread-local pour toutes.
+import os
+import threading
+import weakref
+from bisect import bisect_left
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seaux de durée (secondes) : de 50µs à 2.5s
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# Seaux de taille de lot (lignes)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _ShardOwner:
+    """Objet propre au thread : sa collecte, à la fin du thread, retire le tableau"""
+    __slots__ = ('__weakref__',)
+
+
+class _Shards:
+    """Valeurs d'une série réparties par thread.
+
+    Chaque thread incrémente son propre tableau, sans verrou ni course
+    possible ; le rendu additionne les tableaux de tous les threads. Quand un
+    thread se termine, son tableau est reporté dans un total commun et libéré
+    (un serveur qui crée un thread par requête ne fait pas grossir la série).
+    """
+    __slots__ = ('size', '_local', '_shards', '_retired', '_lock')
+
+    def __init__(self, size):
+        self.size = size
+        self._local = threading.local()
+        self._shards = {}
+        self._retired = [0] * size
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = [0] * self.size
+            # Les données du thread-local sont libérées à la fin du thread, propriétaire compris
+            owner = self._local.owner = _ShardOwner()
+            with self._lock:
+                self._shards[id(shard)] = shard
+            weakref.finalize(owner, self._retire, shard)
+            return shard
+
+    def _retire(self, shard):
+        with self._lock:
+            if self._shards.pop(id(shard), None) is not None:
+                self._retired = [a + b for a, b in zip(self._retired, shard)]
+
+    def totals(self):
+        with self._lock:
+            shards = [self._retired, *self._shards.values()]
+        return [sum(values) for values in zip(*shards)]
+
+
+class _CounterSeries(_Shards):
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount=1):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._shard()
+        shard[0] += amount
+
+    @property
+    def value(self):
+        return self.totals()[0]
+
+
+class _HistogramSeries(_Shards):
+    # Un compteur par seau (dernier seau : +Inf) puis la somme des valeurs
+    __slots__ = ('bounds',)
+
+    def __init__(self, bounds):
+        super().__init__(len(bounds) + 2)
+        self.bounds = bounds
+
+    def observe(self, value):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._shard()
+        shard[bisect_left(self.bounds, value)] += 1
+        shard[-1] += value
+
+    def snapshot(self):
+        totals = self.totals()
+        return totals[:-1], totals[-1]
+
+
+class SeriesGroup(_Shards):
+    """Tableau par thread partagé par plusieurs séries, chacune sur sa tranche.
+
+    `shard()` est lu une fois puis passé aux `observe_into` de chaque série.
+    Les séries sont ajoutées (`Histogram.grouped`) avant la première observation.
+    """
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__(0)
+
+    def allocate(self, size):
+        """Réserve `size` cases et renvoie leur position"""
+        with self._lock:
+            if self._shards or any(self._retired):
+                raise RuntimeError("series must be grouped before the first observation")
+            offset = self.size
+            self.size += size
+            self._retired = [0] * self.size
+        return offset
+
+    def shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            return self._shard()
+
+
+class _GroupedHistogramSeries:
+    """Histogramme rangé dans un SeriesGroup, à partir de `offset`"""
+    __slots__ = ('group', 'bounds', 'offset', '_sum')
+
+    def __init__(self, group, bounds):
+        self.group = group
+        self.bounds = bounds
+        self.offset = group.allocate(len(bounds) + 2)
+        self._sum = self.offset + len(bounds) + 1
+
+    def observe(self, value):
+        self.observe_into(self.group.shard(), value)
+
+    def observe_into(self, shard, value):
+        shard[self.offset + bisect_left(self.bounds, value)] += 1
+        shard[self._sum] += value
+
+    def snapshot(self):
+        totals = self.group.totals()[self.offset:self._sum + 1]
+        return totals[:-1], totals[-1]
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+
+class _SeriesMetric(_Metric):
+    """Métrique dont les séries (une par jeu de labels) sont créées par `new_series`"""
+
+    def __init__(self, name, help, labelnames, new_series):
+        super().__init__(name, help, labelnames)
+        self._new_series = new_series
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """Série d'un jeu de labels (créée au premier appel)"""
+        series = self._series.get(values)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(values, self._new_series())
+        return series
+
+    def render(self):
+        lines = self.header()
+        for values, series in sorted(self._series.items()):
+            lines.extend(self._render_series(values, series))
+        return lines
+
+
+class Counter(_SeriesMetric):
+    type = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames, _CounterSeries)
+
+    def inc(self, *values, amount=1):
+        self.labels(*values).inc(amount)
+
+    def _render_series(self, values, series):
+        return [f"{self.name}{_labels(self.labelnames, values)} {_number(series.value)}"]
+
+
+class Histogram(_SeriesMetric):
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames, lambda: _HistogramSeries(self.buckets))
+
+    def observe(self, *values, value):
+        self.labels(*values).observe(value)
+
+    def grouped(self, group, *values):
+        """Série d'un jeu de labels rangée dans `group` (mise à jour via observe_into)"""
+        with self._lock:
+            if values in self._series:
+                raise ValueError(f"{self.name}{values} already exists")
+            series = self._series[values] = _GroupedHistogramSeries(group, self.buckets)
+        return series
+
+    def _render_series(self, values, series):
+        counts, total = series.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = f'le="{_number(bound)}"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, values, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, values)} {_number(total)}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, values)} {cumulative}")
+        return lines
+
+
+class Callback(_Metric):
+    """Valeurs lues au moment du rendu : `collect()` renvoie [(valeurs des labels, valeur)]"""
+
+    def __init__(self, name, help, labelnames=(), collect=None, type='gauge'):
+        super().__init__(name, help, labelnames)
+        self.type = type
+        self.collect = collect
+
+    def render(self):
+        lines = self.header()
+        for values, value in self.collect():
+            lines.append(f"{self.name}{_labels(self.labelnames, values)} {_number(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Ensemble de métriques rendues ensemble sur /metrics"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name, help, labelnames=(), collect=None, type='gauge'):
+        return self.register(Callback(name, help, labelnames, collect, type))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def metrics_enabled():
+    """METRICS_ENABLED=false supprime toute instrumentation du chemin des requêtes"""
+    return os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
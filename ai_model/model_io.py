@@ -0,0 +1,89 @@
+# Écriture atomique des artefacts de modèles (lus en mmap par les workers du service)
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+# Lu une fois à l'import : os.umask ne permet pas de le lire sans le modifier
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _replace(tmp_path, path):
+    """Publie `tmp_path` sous `path` avec les droits d'un fichier créé normalement.
+
+    mkstemp crée en 0600 (et copy2 recopie le mode de la source) : sans chmod,
+    les modèles ne seraient lisibles que par l'utilisateur qui les a écrits.
+    """
+    os.chmod(tmp_path, 0o666 & ~_UMASK)
+    os.replace(tmp_path, path)
+
+
+def atomic_dump(obj, path):
+    """joblib.dump via un fichier temporaire puis os.replace.
+
+    Les workers qui ont mappé l'ancien fichier en mémoire gardent un inode
+    valide ; un réécrasement en place corromprait leurs pages partagées.
+    """
+    # Import différé : le service n'importe joblib que dans son thread de chargement
+    import joblib
+
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        joblib.dump(obj, tmp_path)
+        _replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def atomic_copy(src, dst):
+    """shutil.copy2 atomique (même garantie que atomic_dump)"""
+    dst = Path(dst)
+    fd, tmp_path = tempfile.mkstemp(dir=dst.parent, prefix=f".{dst.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        shutil.copy2(src, tmp_path)
+        _replace(tmp_path, dst)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return dst
+
+
+def atomic_write_json(obj, path):
+    """Écrit `obj` en JSON via un fichier temporaire puis os.replace"""
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(obj, f, indent=2, default=str)
+        _replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def update_metrics(path, updates):
+    """Fusionne `updates` dans un fichier de métriques JSON (lecture-modification-écriture atomique).
+
+    Les clés de premier niveau absentes de `updates` sont conservées, ce qui
+    permet aux deux entraîneurs d'écrire chacun leur section.
+    """
+    path = Path(path)
+    try:
+        with open(path) as f:
+            metrics = json.load(f)
+    except (OSError, ValueError):
+        metrics = {}
+    metrics.update(updates)
+    atomic_write_json(metrics, path)
+    return metrics
@@ -0,0 +1,237 @@
+# Registre des modèles servis : rechargement à chaud et échange atomique
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from compiled_model import load_kernel
+
+logger = logging.getLogger('model_registry')
+
+# Ensemble cohérent de modèles servis ensemble ; remplacé d'un bloc, jamais modifié
+ModelBundle = namedtuple('ModelBundle', ['roi', 'exit', 'version', 'model_dir', 'loaded_at'])
+
+EMPTY_BUNDLE = ModelBundle(None, None, None, None, None)
+
+# Vecteurs de préchauffage (valeurs par défaut des features) : un appel unitaire
+# puis un lot de WARMUP_ROWS lignes par modèle avant publication
+WARMUP_ROWS = int(os.getenv('MODEL_WARMUP_ROWS', '64'))
+ROI_WARMUP = [60.0, 50.0, 0.2, 0.8]
+EXIT_WARMUP = [60.0, 1.0, 0.01, 0.8]
+
+
+class _SklearnRoi:
+    """Repli sklearn quand aucun noyau compilé n'est disponible"""
+    def __init__(self, model, scaler=None):
+        self.model = model
+        self.scaler = scaler
+
+    def predict(self, X):
+        return self.model.predict(self.scaler.transform(X) if self.scaler is not None else X)
+
+
+class _SklearnExit:
+    def __init__(self, model):
+        self.model = model
+        self.backend = "hgb" if hasattr(model, '_predictors') else "gbm"
+
+    def predict(self, X):
+        return self.model.predict_proba(X)[:, 1]
+
+
+def load_roi_model(model_dir, mmap_mode=None):
+    """Charge le noyau ROI compilé, ou à défaut le modèle sklearn et son scaler"""
+    model_dir = Path(model_dir)
+    if (model_dir / "roi_kernel.joblib").exists():
+        return load_kernel(model_dir / "roi_kernel.joblib", mmap_mode=mmap_mode)
+    if (model_dir / "roi_model.joblib").exists():
+        # Repli coûteux (import de sklearn) : seulement sans noyau compilé
+        import joblib
+        scaler_path = model_dir / "roi_scaler.joblib"
+        scaler = joblib.load(scaler_path, mmap_mode=mmap_mode) if scaler_path.exists() else None
+        return _SklearnRoi(joblib.load(model_dir / "roi_model.joblib", mmap_mode=mmap_mode), scaler)
+    return None
+
+
+def load_exit_model(model_dir, mmap_mode=None):
+    """Charge le noyau de sortie compilé, ou à défaut le modèle sklearn"""
+    model_dir = Path(model_dir)
+    if (model_dir / "exit_kernel.joblib").exists():
+        return load_kernel(model_dir / "exit_kernel.joblib", mmap_mode=mmap_mode)
+    if (model_dir / "exit_model.joblib").exists():
+        import joblib
+        return _SklearnExit(joblib.load(model_dir / "exit_model.joblib", mmap_mode=mmap_mode))
+    return None
+
+
+def warm_up(model, row, rows=WARMUP_ROWS):
+    """Premiers appels hors trafic : une ligne (chemin des micro-batches) puis un lot"""
+    if model is None:
+        return
+    X = np.tile(np.asarray(row, dtype=np.float64), (max(rows, 1), 1))
+    X *= np.linspace(0.5, 1.5, len(X))[:, None]
+    model.predict(X[:1])
+    model.predict(X)
+
+
+def default_model_dir():
+    """MODEL_DIR, sinon models/production s'il contient des modèles, sinon models/ ou ."""
+    if os.getenv('MODEL_DIR'):
+        return Path(os.getenv('MODEL_DIR'))
+    production = Path("models") / "production"
+    if production.is_dir() and any(production.glob("*.joblib")):
+        return production
+    return Path("models") if os.path.exists("models") else Path(".")
+
+
+class ModelRegistry:
+    """Surveille le répertoire des modèles et échange les versions sans interruption.
+
+    Les nouveaux fichiers sont chargés en arrière-plan (ROI et sortie en
+    parallèle), préchauffés, puis publiés par une seule affectation de
+    `current` : une requête en cours garde le bundle qu'elle a lu. Les
+    tableaux sont mappés en mémoire (mmap_mode) pour que les workers d'un même
+    conteneur partagent les mêmes pages. `ready` est levé au premier
+    chargement qui trouve les modèles ROI et de sortie.
+    """
+
+    def __init__(self, model_dir=None, poll_interval=5.0, mmap_mode='r'):
+        self._fixed_dir = Path(model_dir) if model_dir else None
+        self.poll_interval = poll_interval
+        self.mmap_mode = mmap_mode
+        self.current = EMPTY_BUNDLE
+        self._signature = None
+        self._pending = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._loader = None
+        self.ready = threading.Event()
+        self.load_error = None
+        self.load_seconds = None
+        self.started_at = time.perf_counter()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    @property
+    def model_dir(self):
+        return self._fixed_dir or default_model_dir()
+
+    def on_swap(self, callback):
+        """Enregistre un callback appelé avec le nouveau bundle après chaque échange"""
+        self._listeners.append(callback)
+
+    def _snapshot(self, model_dir):
+        files = sorted(model_dir.glob("*.joblib")) if model_dir.is_dir() else []
+        return tuple((f.name, f.stat().st_mtime_ns, f.stat().st_size) for f in files)
+
+    def load(self):
+        """Charge le contenu actuel du répertoire et le publie"""
+        with self._lock:
+            model_dir = self.model_dir
+            signature = self._snapshot(model_dir)
+            with ThreadPoolExecutor(max_workers=2, thread_name_prefix='model-load') as pool:
+                roi = pool.submit(load_roi_model, model_dir, self.mmap_mode)
+                exit_model = pool.submit(load_exit_model, model_dir, self.mmap_mode)
+                roi, exit_model = roi.result(), exit_model.result()
+            warm_up(roi, ROI_WARMUP)
+            warm_up(exit_model, EXIT_WARMUP)
+            bundle = ModelBundle(
+                roi=roi,
+                exit=exit_model,
+                version=hashlib.sha1(repr((str(model_dir), signature)).encode()).hexdigest()[:12],
+                model_dir=str(model_dir),
+                loaded_at=time.time()
+            )
+            self._signature = (str(model_dir), signature)
+            self._pending = None
+            self.current = bundle
+            # Prêt seulement avec les deux modèles : sans eux le scoring répondrait 500
+            if not self.ready.is_set() and roi is not None and exit_model is not None:
+                self.load_seconds = time.perf_counter() - self.started_at
+                self.ready.set()
+
+        for callback in self._listeners:
+            try:
+                callback(bundle)
+            except Exception as e:
+                logger.error(f"Erreur callback rechargement: {e}")
+        logger.info(f"Modèles version {bundle.version} chargés depuis {model_dir}")
+        return bundle
+
+    def _load_in_background(self):
+        try:
+            self.load()
+            self.load_error = None
+        except Exception as e:
+            self.load_error = str(e)
+            logger.error(f"Échec du chargement initial des modèles depuis {self.model_dir}: {e}")
+
+    @property
+    def loading(self):
+        """Premier chargement en cours dans le thread de chargement"""
+        return self._loader is not None and self._loader.is_alive()
+
+    def load_async(self):
+        """Premier chargement dans un thread : le service écoute pendant ce temps (voir `ready`)"""
+        if self._loader is None or not self._loader.is_alive():
+            self._loader = threading.Thread(target=self._load_in_background, name='model-loader', daemon=True)
+            self._loader.start()
+        return self._loader
+
+    def reload_if_changed(self):
+        """Recharge si le répertoire a changé et est resté stable depuis le dernier passage"""
+        model_dir = self.model_dir
+        signature = (str(model_dir), self._snapshot(model_dir))
+        if signature == self._signature:
+            self._pending = None
+            return False
+        # Attendre deux relevés identiques : une promotion copie les fichiers un par un
+        if signature != self._pending:
+            self._pending = signature
+            return False
+        try:
+            self.load()
+            return True
+        except Exception as e:
+            logger.error(f"Échec du rechargement depuis {model_dir}, version courante conservée: {e}")
+            self._signature = signature
+            return False
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                if self._loader is not None and self._loader.is_alive():
+                    continue
+                if not self.ready.is_set() and self.load_error is not None:
+                    # Chargement initial en échec : réessayer à chaque passage
+                    self._load_in_background()
+                else:
+                    self.reload_if_changed()
+            except Exception as e:
+                logger.error(f"Erreur surveillance des modèles: {e}")
+
+    def start(self):
+        """Démarre le thread de surveillance (idempotent)"""
+        if self.poll_interval <= 0:
+            return
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._watch, name='model-watcher', daemon=True)
+            self._thread.start()
+
+    def _after_fork(self):
+        # Les threads ne survivent pas au fork des workers gunicorn
+        self._lock = threading.Lock()
+        if self._loader is not None and not self.ready.is_set():
+            self._loader = None
+            self.load_async()
+        if self._thread is not None:
+            self._thread = None
+            self.start()
@@ -0,0 +1,139 @@
+# Recherche d'hyperparamètres parallèle (grille, aléatoire ou halving) pour les entraîneurs
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from joblib import Memory
+from sklearn.base import is_classifier
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import (GridSearchCV, HalvingGridSearchCV, KFold,
+                                     RandomizedSearchCV, StratifiedKFold)
+
+METHODS = ('none', 'grid', 'random', 'halving')
+
+LEADERBOARD_SIZE = 10
+
+
+def add_search_arguments(parser):
+    """Options communes de recherche des scripts d'entraînement (défauts lus dans l'environnement)"""
+    parser.add_argument('--search', choices=METHODS, default=os.getenv('MODEL_SEARCH', 'none'),
+                        help='Hyperparameter search method (default: MODEL_SEARCH or none)')
+    parser.add_argument('--n-iter', type=int, default=int(os.getenv('MODEL_SEARCH_N_ITER', '20')),
+                        help='Candidates sampled by random search')
+    parser.add_argument('--n-jobs', type=int, default=int(os.getenv('MODEL_SEARCH_N_JOBS', '-1')),
+                        help='Worker processes (-1 = all cores)')
+    parser.add_argument('--cv', type=int, default=int(os.getenv('MODEL_SEARCH_CV', '5')),
+                        help='Cross-validation folds')
+    parser.add_argument('--scoring', default=os.getenv('MODEL_SEARCH_SCORING') or None,
+                        help='sklearn scoring name (default: estimator score)')
+    return parser
+
+
+def search_options(args):
+    """Arguments de `search_model` à partir des options de la ligne de commande"""
+    if args.search == 'none':
+        return None
+    return {
+        "method": args.search,
+        "n_iter": args.n_iter,
+        "n_jobs": args.n_jobs,
+        "cv": args.cv,
+        "scoring": args.scoring
+    }
+
+
+def _leaderboard(cv_results, size=LEADERBOARD_SIZE):
+    # En halving, un candidat apparaît à chaque itération : garder sa dernière évaluation
+    iterations = cv_results.get('iter', np.zeros(len(cv_results['params']), dtype=int))
+    latest = {}
+    for i, params in enumerate(cv_results['params']):
+        latest[repr(sorted(params.items()))] = i
+    ranked = sorted(latest.values(), key=lambda i: (-iterations[i], -cv_results['mean_test_score'][i]))
+
+    return [
+        {
+            "rank": rank + 1,
+            "params": cv_results['params'][i],
+            "mean_score": float(cv_results['mean_test_score'][i]),
+            "std_score": float(cv_results['std_test_score'][i]),
+            "fit_time": float(cv_results['mean_fit_time'][i])
+        }
+        for rank, i in enumerate(ranked[:size])
+    ]
+
+
+def _plain(params):
+    return {k: v.item() if isinstance(v, np.generic) else v for k, v in params.items()}
+
+
+def search_model(estimator, space, X, y, method='random', n_iter=20, n_jobs=-1, cv=5,
+                 scoring=None, random_state=42):
+    """Cherche les meilleurs hyperparamètres de `estimator` dans `space`.
+
+    Les candidats sont évalués en parallèle sur un pool de processus
+    (`n_jobs`) avec les mêmes plis, calculés une fois. Si `estimator` est un
+    Pipeline, ses étapes de prétraitement sont mises en cache par pli : un
+    même pli n'est standardisé qu'une fois pour tous les candidats.
+
+    Renvoie un dict : estimator (réentraîné sur tout X), params, cv_score,
+    leaderboard, method, n_candidates, scoring, cv, elapsed.
+    """
+    # Les DataFrames sont gardés tels quels : les modèles retiennent les noms de features
+    if not hasattr(X, 'columns'):
+        X = np.ascontiguousarray(X, dtype=np.float64)
+    y = np.asarray(y)
+    splitter = StratifiedKFold if is_classifier(estimator) else KFold
+    folds = list(splitter(n_splits=cv, shuffle=True, random_state=random_state).split(X, y))
+
+    cache_dir = None
+    if hasattr(estimator, 'steps'):
+        cache_dir = tempfile.mkdtemp(prefix='model_search_')
+        estimator = estimator.set_params(memory=Memory(cache_dir, verbose=0))
+
+    common = {"scoring": scoring, "cv": folds, "n_jobs": n_jobs, "refit": True}
+    if method == 'grid':
+        searcher = GridSearchCV(estimator, space, **common)
+    elif method == 'random':
+        searcher = RandomizedSearchCV(estimator, space, n_iter=n_iter, random_state=random_state, **common)
+    elif method == 'halving':
+        searcher = HalvingGridSearchCV(estimator, space, factor=3, random_state=random_state, **common)
+    else:
+        raise ValueError(f"Unknown search method: {method}")
+
+    start = time.perf_counter()
+    try:
+        searcher.fit(X, y)
+    finally:
+        if cache_dir is not None:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+    elapsed = time.perf_counter() - start
+
+    best = searcher.best_estimator_
+    if cache_dir is not None:
+        best.set_params(memory=None)
+
+    leaderboard = _leaderboard(searcher.cv_results_)
+    for entry in leaderboard:
+        entry["params"] = _plain(entry["params"])
+
+    print(f"Recherche {method}: {len(searcher.cv_results_['params'])} évaluations en {elapsed:.1f}s, "
+          f"meilleur score CV {searcher.best_score_:.4f} avec {_plain(searcher.best_params_)}")
+
+    return {
+        "estimator": best,
+        "params": _plain(searcher.best_params_),
+        "cv_score": float(searcher.best_score_),
+        "leaderboard": leaderboard,
+        "method": method,
+        "n_candidates": int(searcher.n_candidates_[0]) if method == 'halving' else len(searcher.cv_results_['params']),
+        "scoring": scoring or ('accuracy' if is_classifier(estimator) else 'r2'),
+        "cv": cv,
+        "elapsed": round(elapsed, 3)
+    }
+
+
+def search_summary(result):
+    """Partie de `search_model` enregistrée dans metrics.json"""
+    return {k: v for k, v in result.items() if k != 'estimator'}
@@ -0,0 +1,272 @@
+# Mises à jour incrémentales des modèles entre deux réentraînements complets
+#
+# Les trades sortis depuis le dernier watermark (models/online_state.json) sont
+# intégrés sans repartir de zéro :
+#   - ROI/sec : régression linéaire SGD initialisée avec les coefficients du
+#     modèle courant (Ridge ou SGD) puis partial_fit sur les nouveaux trades ;
+#   - sortie : warm_start, quelques arbres ajoutés sur les nouveaux trades.
+# Les deux mises à jour sont calculées en mémoire et ne sont publiées que si toutes
+# ont réussi. Quand le service sert models/production, elles passent par la même
+# porte que /retrain : écrites dans models/staging, promues seulement si chaque
+# modèle mis à jour bat celui de production sur VALIDATION_DATA_PATH. Sinon
+# (service sur models/, sans validation) elles sont écrites dans le répertoire
+# servi. Le service les recharge à chaud. Chaque modèle a son propre watermark,
+# avancé seulement si ce qu'il a appris est publié.
+import argparse
+import json
+import os
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDRegressor
+from sklearn.metrics import accuracy_score, r2_score
+
+import exit_predictor
+import train_model
+from compiled_model import build_kernel, compile_exit_model, compile_linear, write_kernel
+from model_io import atomic_dump, update_metrics
+from model_registry import default_model_dir
+
+STATE_FILE = "online_state.json"
+
+# Nombre minimal de nouveaux trades pour une mise à jour
+MIN_TRADES = int(os.getenv('ONLINE_MIN_TRADES', '50'))
+# ROI/sec : pas d'apprentissage, régularisation L2 et passes sur les nouveaux trades
+ROI_ETA0 = float(os.getenv('ONLINE_ROI_ETA0', '0.001'))
+ROI_ALPHA = float(os.getenv('ONLINE_ROI_ALPHA', '0.0001'))
+ROI_EPOCHS = int(os.getenv('ONLINE_ROI_EPOCHS', '1'))
+# Sortie : arbres ajoutés par mise à jour, au-delà de EXIT_MAX_TREES un réentraînement complet est requis
+EXIT_TREES = int(os.getenv('ONLINE_EXIT_TREES', '10'))
+EXIT_MAX_TREES = int(os.getenv('ONLINE_EXIT_MAX_TREES', '1000'))
+
+
+def model_dir():
+    """Répertoire servi : les mises à jour écrites ailleurs ne seraient jamais chargées"""
+    return default_model_dir()
+
+
+def load_state(path=None):
+    try:
+        with open(path or model_dir() / STATE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def get_watermark(state, model, training_data_path=None):
+    """Date de sortie du dernier trade intégré par `model` ("roi" ou "exit").
+
+    Sans état, les trades postérieurs au dernier export d'entraînement sont
+    considérés comme nouveaux (date de modification du fichier exporté).
+    L'ancien watermark commun sert aux deux modèles.
+    """
+    watermark = (state.get("watermarks") or {}).get(model) or state.get("watermark")
+    if watermark:
+        return datetime.fromisoformat(watermark)
+    training_data_path = training_data_path or os.getenv('TRAINING_DATA_PATH', 'training_data.jsonl')
+    if os.path.exists(training_data_path):
+        return datetime.fromtimestamp(os.path.getmtime(training_data_path))
+    return None
+
+
+def reset_watermark(timestamp, path=None):
+    """Appelé après un réentraînement complet : les trades antérieurs sont déjà appris"""
+    return update_metrics(path or model_dir() / STATE_FILE, {
+        "watermarks": {model: timestamp.isoformat() for model in UPDATES},
+        "reset_at": datetime.now().isoformat()
+    })
+
+
+def update_roi(df, path):
+    """partial_fit d'un SGDRegressor repris des coefficients du modèle ROI courant.
+
+    Renvoie (résumé, artefacts à écrire) ou None si le modèle n'a rien appris.
+    """
+    df = df.dropna(subset=train_model.FEATURES + [train_model.TARGET])
+    if len(df) < MIN_TRADES:
+        return None
+
+    model = joblib.load(path / "roi_model.joblib")
+    scaler = joblib.load(path / "roi_scaler.joblib")
+    X = scaler.transform(df[train_model.FEATURES])
+    y = df[train_model.TARGET].to_numpy(dtype=np.float64)
+
+    # Score sur les nouveaux trades avant de les apprendre (évaluation prequential)
+    r2_before = float(r2_score(y, model.predict(X)))
+
+    if isinstance(model, SGDRegressor):
+        for _ in range(ROI_EPOCHS):
+            model.partial_fit(X, y)
+    else:
+        # Premier passage : le modèle Ridge devient un SGD au même point de départ
+        sgd = SGDRegressor(alpha=ROI_ALPHA, learning_rate='constant', eta0=ROI_ETA0,
+                           max_iter=ROI_EPOCHS, tol=None, shuffle=True, random_state=42)
+        sgd.fit(X, y, coef_init=np.ravel(model.coef_), intercept_init=np.ravel(model.intercept_))
+        model = sgd
+
+    if not np.all(np.isfinite(model.coef_)):
+        print("⚠️ Mise à jour ROI divergente, modèle courant conservé")
+        return None
+
+    kernel = build_kernel(
+        lambda: compile_linear(model, scaler),
+        lambda X: model.predict(scaler.transform(X)),
+        df[train_model.FEATURES]
+    )
+    summary = {"n_trades": len(df), "r2_before": r2_before,
+               "r2_after": float(r2_score(y, model.predict(X))), "model": type(model).__name__}
+    return summary, {"roi_model.joblib": model, "roi_kernel.joblib": kernel}
+
+
+def update_exit(df, path):
+    """Ajoute EXIT_TREES arbres (warm_start) appris sur les nouveaux trades (même retour que update_roi)"""
+    df = df.copy()
+    if "time_since_buy" not in df.columns and "time_held" in df.columns:
+        # À la sortie, le temps depuis l'achat est la durée de détention
+        df["time_since_buy"] = df["time_held"]
+    if not set(exit_predictor.FEATURES + [exit_predictor.TARGET]).issubset(df.columns):
+        return None
+    df = df.dropna(subset=exit_predictor.FEATURES + [exit_predictor.TARGET])
+    X = df[exit_predictor.FEATURES]
+    y = df[exit_predictor.TARGET].astype(int)
+    if len(df) < MIN_TRADES or y.nunique() < 2:
+        return None
+
+    model = joblib.load(path / "exit_model.joblib")
+    trees = exit_predictor.n_trees(model)
+    if trees + EXIT_TREES > EXIT_MAX_TREES:
+        print(f"⚠️ Modèle de sortie à {trees} arbres : réentraînement complet requis")
+        return None
+
+    accuracy_before = float(accuracy_score(y, model.predict(X)))
+
+    if hasattr(model, '_predictors'):
+        # hgb : l'arrêt anticipé découperait un lot déjà petit
+        model.set_params(warm_start=True, early_stopping=False, max_iter=trees + EXIT_TREES)
+    else:
+        model.set_params(warm_start=True, n_estimators=trees + EXIT_TREES)
+    model.fit(X, y)
+
+    kernel = build_kernel(
+        lambda: compile_exit_model(model),
+        lambda X: model.predict_proba(X)[:, 1],
+        X
+    )
+    summary = {"n_trades": len(df), "accuracy_before": accuracy_before,
+               "accuracy_after": float(accuracy_score(y, model.predict(X))), "n_trees": exit_predictor.n_trees(model)}
+    return summary, {"exit_model.joblib": model, "exit_kernel.joblib": kernel}
+
+
+UPDATES = {
+    "roi": (update_roi, "roi_model.joblib"),
+    "exit": (update_exit, "exit_model.joblib"),
+}
+
+
+def publish(path, artifacts):
+    """Écrit les artefacts des mises à jour réussies (noyau None : ancien noyau supprimé)"""
+    for name, obj in artifacts.items():
+        if name.endswith("_kernel.joblib"):
+            write_kernel(obj, path / name)
+        else:
+            atomic_dump(obj, path / name)
+
+
+def promote(path, artifacts, models):
+    """Publie les mises à jour de `models` via staging et validation ; renvoie (publié, détails, raison du refus)"""
+    from validate_model import ModelValidator
+
+    validator = ModelValidator()
+    if path.resolve() != validator.production_dir.resolve():
+        # Service hors de models/production : pas de modèle de référence, écriture directe
+        publish(path, artifacts)
+        return True, None, None
+
+    # Staging = modèles servis + mises à jour : seuls les modèles mis à jour sont comparés
+    validator.stage_models(path)
+    publish(validator.staging_dir, artifacts)
+    test_data_path = os.getenv('VALIDATION_DATA_PATH', 'test_data.csv')
+    try:
+        ok, results = validator.validate_staging(test_data_path, models=models)
+    except Exception as e:
+        return False, None, f"validation failed ({test_data_path}): {e}"
+    if not ok:
+        return False, results, "staging models do not beat production"
+    validator.promote_models()
+    return True, results, None
+
+
+def run(since=None, collector=None):
+    """Intègre dans chaque modèle les trades sortis depuis son watermark ; renvoie le résumé ou None"""
+    from data_collector import DataCollector
+
+    path = model_dir()
+    state_path = path / STATE_FILE
+    state = load_state(state_path)
+    watermarks = {model: since or get_watermark(state, model) for model in UPDATES}
+
+    collector = collector or DataCollector()
+    # Borne haute figée avant la lecture : les trades arrivés pendant la mise à jour attendront la suivante
+    until = collector.latest_exit_time()
+    pending = [model for model, (_, model_file) in UPDATES.items()
+               if (path / model_file).exists() and (watermarks[model] is None or watermarks[model] < until)] \
+        if until is not None else []
+    if not pending:
+        print("Aucun nouveau trade depuis la dernière mise à jour")
+        return None
+
+    # Une lecture par watermark distinct (le plus souvent une seule pour les deux modèles)
+    trades = {}
+    results, artifacts = {}, {}
+    for model in pending:
+        if watermarks[model] not in trades:
+            frames = list(collector.iter_training_frames(since=watermarks[model], until=until))
+            trades[watermarks[model]] = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        df = trades[watermarks[model]]
+        if len(df) < MIN_TRADES:
+            print(f"{model}: {len(df)} nouveaux trades (< {MIN_TRADES}), mise à jour reportée")
+            continue
+        print(f"{model}: mise à jour incrémentale avec {len(df)} trades sortis depuis {watermarks[model]}")
+        update, _ = UPDATES[model]
+        outcome = update(df, path)
+        if outcome is not None:
+            results[model], files = outcome
+            artifacts.update(files)
+
+    if not results:
+        print("Aucun modèle mis à jour, watermarks inchangés")
+        return None
+
+    # Toutes les mises à jour ont réussi : publication (validée), puis avancée des
+    # watermarks des seuls modèles qui ont appris (les autres reprendront les mêmes trades)
+    published, validation, reason = promote(path, artifacts, list(results))
+    if not published:
+        print(f"❌ Mise à jour de {', '.join(results)} non publiée: {reason}, watermarks inchangés")
+        update_metrics(path / "metrics.json", {"online_rejected": {
+            "rejected_at": datetime.now().isoformat(), "reason": reason, "validation": validation,
+            **results,
+        }})
+        return None
+    for model in results:
+        watermarks[model] = until
+    summary = {
+        "watermarks": {model: value.isoformat() if value else None for model, value in watermarks.items()},
+        "updated_at": datetime.now().isoformat(),
+        "validation": validation,
+        **{model: results.get(model) for model in UPDATES},
+    }
+
+    update_metrics(path / "metrics.json", {"online": summary})
+    update_metrics(state_path, summary)
+    print(f"✅ Watermark de {', '.join(results)} avancé à {until}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Fold trades newer than the last watermark into the models')
+    parser.add_argument('--since', type=datetime.fromisoformat, default=None,
+                        help='Override the watermark (ISO date)')
+    args = parser.parse_args()
+    run(since=args.since)
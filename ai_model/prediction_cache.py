@@ -0,0 +1,109 @@
+# Cache LRU/TTL des prédictions, indexé par vecteur de features quantifié
+import os
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_QUANTUM = 1e-4
+# Pas par modèle et par feature :
+#   roi  : time_since_launch, holders, volatility, creator_score
+#   exit : time_since_buy, roi, roi_per_sec (~1e-3, pas plus fin), creator_score
+MODEL_QUANTUM = {
+    "roi": "1e-4",
+    "exit": "1e-4,1e-4,1e-7,1e-4",
+}
+
+
+class PredictionCache:
+    """Cache des prédictions unitaires.
+
+    La clé combine le nom du modèle, sa version et le vecteur de features
+    arrondi au pas `quantum` (un float, un pas par feature, ou un dict
+    {modèle: pas} : les features ROI et de sortie n'ont pas les mêmes
+    échelles) : 0.80 et 0.8000001 tombent sur la même entrée. Une ligne non
+    finie (NaN, inf) n'a pas de clé et n'est jamais mise en cache. Les entrées
+    expirent après `ttl` secondes et les moins récemment utilisées sont
+    évincées au-delà de `max_size`.
+    """
+
+    def __init__(self, max_size=100000, ttl=60.0, quantum=1e-4):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.quantum = quantum
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, model, version, row):
+        """Clé du cache, None si la ligne n'est pas quantifiable"""
+        quantum = self.quantum.get(model, DEFAULT_QUANTUM) if isinstance(self.quantum, dict) else self.quantum
+        try:
+            if isinstance(quantum, (list, tuple)):
+                quantized = tuple(round(v / q) for v, q in zip(row, quantum))
+            else:
+                quantized = tuple(round(v / quantum) for v in row)
+        except (ValueError, OverflowError):
+            return None
+        return (model, version, quantized)
+
+    def get(self, key):
+        """Renvoie la valeur en cache ou None"""
+        if key is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        if key is None:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self, *_):
+        """Vide le cache (appelé à chaque rechargement de modèles)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+
+def _parse_quantum(value):
+    quantum = [float(q) for q in value.split(',')]
+    return quantum[0] if len(quantum) == 1 else tuple(quantum)
+
+
+def cache_from_env():
+    """PREDICTION_CACHE_SIZE (0 = désactivé), PREDICTION_CACHE_TTL, PREDICTION_CACHE_QUANTUM_ROI / _EXIT"""
+    max_size = int(os.getenv('PREDICTION_CACHE_SIZE', '100000'))
+    if max_size <= 0:
+        return None
+    # PREDICTION_CACHE_QUANTUM (ancien réglage commun) sert de valeur par défaut aux deux modèles
+    common = os.getenv('PREDICTION_CACHE_QUANTUM')
+    return PredictionCache(
+        max_size=max_size,
+        ttl=float(os.getenv('PREDICTION_CACHE_TTL', '60')),
+        quantum={
+            model: _parse_quantum(os.getenv(f'PREDICTION_CACHE_QUANTUM_{model.upper()}') or common or default)
+            for model, default in MODEL_QUANTUM.items()
+        }
+    )
@@ -0,0 +1,153 @@
+# Profilage à la demande : échantillonneur de piles (service) et cProfile par étape (scripts)
+#
+# Désactivé, rien n'est instrumenté : l'échantillonneur n'existe que le temps
+# d'un appel à /admin/profile et `stage()` se réduit à un test de variable
+# globale par étape de pipeline (pas par ligne ni par requête).
+import cProfile
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+DEFAULT_INTERVAL = 0.005
+MAX_SECONDS = float(os.getenv('PROFILE_MAX_SECONDS', '60'))
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Relève les piles de tous les threads toutes les `interval` secondes.
+
+    Le résultat est au format « collapsed stacks » (une ligne
+    `thread;racine;...;feuille compte`), lu par flamegraph.pl, speedscope ou
+    inferno. Le thread de l'échantillonneur est exclu.
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+
+    def sample(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[';'.join(reversed(stack))] += 1
+        self.samples += 1
+
+    def run(self, seconds):
+        """Échantillonne pendant `seconds` secondes dans le thread appelant"""
+        deadline = time.perf_counter() + seconds
+        while True:
+            self.sample()
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            time.sleep(min(self.interval, remaining))
+        return self
+
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+_profile_lock = threading.Lock()
+
+
+def check_admin_token(provided):
+    """ADMIN_TOKEN non défini : endpoints d'administration désactivés"""
+    expected = os.getenv('ADMIN_TOKEN')
+    return bool(expected) and provided is not None and hmac.compare_digest(provided, expected)
+
+
+def admin_token(authorization, header_token):
+    """Jeton fourni en `Authorization: Bearer ...` ou en `X-Admin-Token`"""
+    if authorization and authorization.startswith('Bearer '):
+        return authorization[len('Bearer '):]
+    return header_token
+
+
+def handle_profile(token, seconds, interval=None):
+    """Profil échantillonné du processus : (corps, status HTTP, content type)"""
+    if not os.getenv('ADMIN_TOKEN'):
+        return "not found\n", 404, 'text/plain'
+    if not check_admin_token(token):
+        return "unauthorized\n", 401, 'text/plain'
+    try:
+        seconds = float(seconds if seconds is not None else 10)
+        interval = float(interval if interval is not None else DEFAULT_INTERVAL)
+    except ValueError:
+        return "seconds and interval must be numbers\n", 400, 'text/plain'
+    if not 0 < seconds <= MAX_SECONDS or not 0.0005 <= interval <= 1:
+        return f"seconds must be in ]0, {MAX_SECONDS:g}], interval in [0.0005, 1]\n", 400, 'text/plain'
+
+    # Un seul profil à la fois par processus
+    if not _profile_lock.acquire(blocking=False):
+        return "a profile is already running\n", 409, 'text/plain'
+    try:
+        profiler = SamplingProfiler(interval).run(seconds)
+    finally:
+        _profile_lock.release()
+    return profiler.collapsed(), 200, 'text/plain; charset=utf-8'
+
+
+# cProfile par étape pour les scripts d'entraînement et de collecte
+
+_output_dir = None
+_prefix = None
+_active = False
+
+
+def add_profile_argument(parser):
+    parser.add_argument('--profile', nargs='?', const='profiles', default=os.getenv('PROFILE_DIR') or None,
+                        metavar='DIR', help='Write cProfile stats per pipeline stage to DIR (default: profiles)')
+    return parser
+
+
+def configure(output_dir, prefix):
+    """Active le profilage par étape ; les fichiers sont nommés `<prefix>.<étape>.pstats`"""
+    global _output_dir, _prefix
+    _output_dir = Path(output_dir) if output_dir else None
+    _prefix = prefix
+    if _output_dir is not None:
+        _output_dir.mkdir(parents=True, exist_ok=True)
+
+
+@contextmanager
+def stage(name):
+    """Profile le bloc avec cProfile si le profilage est activé.
+
+    Une étape imbriquée dans une autre est comptée dans l'étape englobante
+    (un seul profileur actif à la fois).
+    """
+    global _active
+    if _output_dir is None or _active:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    _active = True
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _active = False
+        path = _output_dir / f"{_prefix}.{name}.pstats"
+        profiler.dump_stats(path)
+        print(f"⏱️ Étape {name}: {time.perf_counter() - start:.2f}s, profil écrit dans {path}")
+
@@ -0,0 +1,88 @@
+# Lectures Redis groupées (MGET / JSON.MGET) pour le collecteur
+import json
+import logging
+
+import redis
+
+logger = logging.getLogger('redis_batch')
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def _decode(value):
+    if value is None:
+        return None
+    if isinstance(value, bytes):
+        value = value.decode('utf-8')
+    data = json.loads(value)
+    # JSON.GET / JSON.MGET avec le chemin '$' renvoient une liste de correspondances
+    if isinstance(data, list):
+        return data[0] if data else None
+    return data
+
+
+class RedisBatchReader:
+    """Résout des clés JSON par lots au lieu d'un aller-retour par clé.
+
+    Les valeurs stockées en chaînes sont lues avec MGET ; les clés restées
+    vides sont relues avec JSON.MGET si le module ReJSON est présent, ce qui
+    est détecté une seule fois par lecteur.
+    """
+
+    def __init__(self, client, batch_size=DEFAULT_BATCH_SIZE):
+        self.client = client
+        self.batch_size = batch_size
+        self._rejson = None
+
+    @property
+    def rejson(self):
+        if self._rejson is None:
+            try:
+                self.client.execute_command('JSON.GET', '__redis_batch_probe__')
+                self._rejson = True
+            except redis.exceptions.ResponseError:
+                self._rejson = False
+            logger.info(f"ReJSON {'détecté' if self._rejson else 'absent'}")
+        return self._rejson
+
+    def get_json(self, keys):
+        """Renvoie {clé: objet décodé} pour les clés présentes et valides"""
+        keys = list(dict.fromkeys(keys))
+        result = {}
+        for start in range(0, len(keys), self.batch_size):
+            chunk = keys[start:start + self.batch_size]
+            missing = self._decode_into(result, chunk, self.client.mget(chunk))
+            if missing and self.rejson:
+                self._decode_into(result, missing, self.client.execute_command('JSON.MGET', *missing, '$'))
+        return result
+
+    def _decode_into(self, result, keys, values):
+        missing = []
+        for key, value in zip(keys, values):
+            if value is None:
+                missing.append(key)
+                continue
+            try:
+                data = _decode(value)
+            except (ValueError, UnicodeDecodeError) as e:
+                logger.error(f"JSON invalide pour {key}: {e}")
+                continue
+            if data is not None:
+                result[key] = data
+        return missing
+
+    def iter_members(self, key, limit=None, desc=False, page_size=None):
+        """Parcourt les membres d'un sorted set par pages (listes de clés décodées)"""
+        page_size = page_size or self.batch_size
+        start = 0
+        while limit is None or start < limit:
+            stop = start + page_size - 1
+            if limit is not None:
+                stop = min(stop, limit - 1)
+            page = self.client.zrange(key, start, stop, desc=desc)
+            if not page:
+                break
+            yield [member.decode('utf-8') if isinstance(member, bytes) else member for member in page]
+            if len(page) < stop - start + 1:
+                break
+            start = stop + 1
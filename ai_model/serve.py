@@ -1,133 +1,81 @@
 # Service Flask pour exposer les modèles IA
-from flask import Flask, jsonify, request
-import joblib
-import numpy as np
+# inference en premier : le chargement des modèles démarre pendant l'import de Flask
+import inference
 import os
-from pathlib import Path
+import profiling
+import wire
+from flask import Flask, Response, jsonify, request
 
 app = Flask(__name__)
 
-# Chargement des modèles
-MODEL_DIR = Path("models") if os.path.exists("models") else Path(".")
-ROI_MODEL = joblib.load(MODEL_DIR / "roi_model.joblib") if os.path.exists(MODEL_DIR / "roi_model.joblib") else None
-EXIT_MODEL = joblib.load(MODEL_DIR / "exit_model.joblib") if os.path.exists(MODEL_DIR / "exit_model.joblib") else None
+def _scoring_response(endpoint):
+    lean = wire.is_lean(request.args.get('lean'), request.headers.get('X-Response-Mode'))
+    body, status, media = inference.handle_request(endpoint, request.get_data(), request.content_type, lean)
+    return Response(body, status=status, mimetype=media)
 
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({
-        "status": "healthy",
-        "roi_model": ROI_MODEL is not None,
-        "exit_model": EXIT_MODEL is not None
-    })
+    payload, status = inference.handle_health()
+    return jsonify(payload), status
+
+@app.route('/health/live', methods=['GET'])
+def health_live():
+    payload, status = inference.handle_live()
+    return jsonify(payload), status
+
+@app.route('/health/ready', methods=['GET'])
+def health_ready():
+    payload, status = inference.handle_ready()
+    return jsonify(payload), status
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    body, status, content_type = inference.handle_metrics()
+    return Response(body, status=status, content_type=content_type)
+
+@app.route('/admin/profile', methods=['GET'])
+def admin_profile():
+    """Profil échantillonné du worker pendant ?seconds=N (ADMIN_TOKEN requis)"""
+    token = profiling.admin_token(request.headers.get('Authorization'), request.headers.get('X-Admin-Token'))
+    body, status, content_type = profiling.handle_profile(token, request.args.get('seconds'), request.args.get('interval'))
+    return Response(body, status=status, content_type=content_type)
 
 @app.route('/predict', methods=['POST'])
 def predict_roi():
-    if ROI_MODEL is None:
-        return jsonify({"error": "ROI model not loaded"}), 500
-    
-    try:
-        data = request.json
-        features = data.get('features', [])
-        
-        # Format: [time_since_launch, holders, volatility, creator_score]
-        if len(features) != 4:
-            return jsonify({"error": "Invalid features. Expected 4 values."}), 400
-        
-        prediction = ROI_MODEL.predict([features])[0]
-        
-        return jsonify({
-            "roi_per_sec": float(prediction),
-            "features": {
-                "time_since_launch": features[0],
-                "holders": features[1],
-                "volatility": features[2],
-                "creator_score": features[3]
-            }
-        })
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return _scoring_response('predict')
 
 @app.route('/exit', methods=['POST'])
 def predict_exit():
-    if EXIT_MODEL is None:
-        return jsonify({"error": "Exit model not loaded"}), 500
-    
-    try:
-        data = request.json
-        features = data.get('features', [])
-        
-        # Format: [time_since_buy, roi, roi_per_sec, creator_score]
-        if len(features) != 4:
-            return jsonify({"error": "Invalid features. Expected 4 values."}), 400
-        
-        # Prédiction de probabilité (classification)
-        prediction_proba = EXIT_MODEL.predict_proba([features])[0][1]
-        should_exit = prediction_proba > 0.5
-        
-        return jsonify({
-            "should_exit": bool(should_exit),
-            "exit_probability": float(prediction_proba),
-            "features": {
-                "time_since_buy": features[0],
-                "roi": features[1],
-                "roi_per_sec": features[2],
-                "creator_score": features[3]
-            }
-        })
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return _scoring_response('exit')
 
 @app.route('/batch_predict', methods=['POST'])
 def batch_predict():
-    if ROI_MODEL is None:
-        return jsonify({"error": "ROI model not loaded"}), 500
-    
-    try:
-        data = request.json
-        feature_list = data.get('features', [])
-        
-        predictions = []
-        for features in feature_list:
-            if len(features) != 4:
-                predictions.append({"error": "Invalid features"})
-                continue
-                
-            prediction = ROI_MODEL.predict([features])[0]
-            predictions.append({"roi_per_sec": float(prediction)})
-        
-        return jsonify({"predictions": predictions})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return _scoring_response('batch_predict')
+
+@app.route('/batch_exit', methods=['POST'])
+def batch_exit():
+    return _scoring_response('batch_exit')
+
+@app.route('/predict_mint', methods=['POST'])
+def predict_mint():
+    """ROI/sec d'un token dont les features sont lues dans Redis (enriched:{mint})"""
+    return _scoring_response('predict_mint')
+
+@app.route('/batch_predict_mint', methods=['POST'])
+def batch_predict_mint():
+    return _scoring_response('batch_predict_mint')
 
 @app.route('/retrain', methods=['POST'])
 def retrain_models():
-    """Endpoint pour réentraîner les modèles avec de nouvelles données"""
-    try:
-        import subprocess
-        
-        # Exécuter le script d'entraînement
-        result = subprocess.run(['./train.sh'], capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            # Recharger les modèles
-            global ROI_MODEL, EXIT_MODEL
-            ROI_MODEL = joblib.load(MODEL_DIR / "roi_model.joblib")
-            EXIT_MODEL = joblib.load(MODEL_DIR / "exit_model.joblib")
-            
-            return jsonify({
-                "status": "success",
-                "message": "Models retrained successfully",
-                "output": result.stdout
-            })
-        else:
-            return jsonify({
-                "status": "error",
-                "message": "Training failed",
-                "error": result.stderr
-            }), 500
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    """Lance le réentraînement en arrière-plan ; les modèles sont échangés à chaud à la fin"""
+    payload, status = inference.handle_retrain()
+    return jsonify(payload), status
+
+@app.route('/retrain/status', methods=['GET'])
+def retrain_status():
+    payload, status = inference.handle_retrain_status()
+    return jsonify(payload), status
 
 if __name__ == '__main__':
     port = int(os.environ.get('AI_PORT', 8000))
-    app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=port, debug=True)
@@ -0,0 +1,101 @@
+# Service ASGI (asyncio) exposant les mêmes endpoints que serve.py
+#
+# Lancement :
+#   uvicorn serve_asgi:app --host 0.0.0.0 --port 8000 --workers 4
+#   gunicorn -k uvicorn_worker.UvicornWorker --workers 4 serve_asgi:app
+#
+# Les appels aux modèles passent par un pool de threads borné (MODEL_WORKERS)
+# pour ne jamais bloquer la boucle d'événements.
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+import inference
+import profiling
+import wire
+
+MODEL_WORKERS = int(os.getenv('MODEL_WORKERS', '16'))
+MODEL_EXECUTOR = ThreadPoolExecutor(max_workers=MODEL_WORKERS, thread_name_prefix='model')
+
+async def _scoring(request, endpoint):
+    body = await request.body()
+    lean = wire.is_lean(request.query_params.get('lean'), request.headers.get('x-response-mode'))
+    payload, status, media = await asyncio.get_running_loop().run_in_executor(
+        MODEL_EXECUTOR, inference.handle_request, endpoint, body, request.headers.get('content-type'), lean
+    )
+    return Response(payload, status_code=status, media_type=media)
+
+async def health(request):
+    payload, status = inference.handle_health()
+    return JSONResponse(payload, status_code=status)
+
+async def health_live(request):
+    payload, status = inference.handle_live()
+    return JSONResponse(payload, status_code=status)
+
+async def health_ready(request):
+    payload, status = inference.handle_ready()
+    return JSONResponse(payload, status_code=status)
+
+async def metrics(request):
+    body, status, content_type = inference.handle_metrics()
+    return Response(body, status_code=status, headers={'content-type': content_type})
+
+async def admin_profile(request):
+    # Hors du pool des modèles : l'échantillonneur dort la plupart du temps
+    token = profiling.admin_token(request.headers.get('authorization'), request.headers.get('x-admin-token'))
+    body, status, content_type = await asyncio.to_thread(
+        profiling.handle_profile, token, request.query_params.get('seconds'), request.query_params.get('interval')
+    )
+    return Response(body, status_code=status, headers={'content-type': content_type})
+
+async def predict_roi(request):
+    return await _scoring(request, 'predict')
+
+async def predict_exit(request):
+    return await _scoring(request, 'exit')
+
+async def batch_predict(request):
+    return await _scoring(request, 'batch_predict')
+
+async def batch_exit(request):
+    return await _scoring(request, 'batch_exit')
+
+async def predict_mint(request):
+    return await _scoring(request, 'predict_mint')
+
+async def batch_predict_mint(request):
+    return await _scoring(request, 'batch_predict_mint')
+
+async def retrain(request):
+    payload, status = inference.handle_retrain()
+    return JSONResponse(payload, status_code=status)
+
+async def retrain_status(request):
+    payload, status = inference.handle_retrain_status()
+    return JSONResponse(payload, status_code=status)
+
+app = Starlette(routes=[
+    Route('/health', health, methods=['GET']),
+    Route('/health/live', health_live, methods=['GET']),
+    Route('/health/ready', health_ready, methods=['GET']),
+    Route('/metrics', metrics, methods=['GET']),
+    Route('/admin/profile', admin_profile, methods=['GET']),
+    Route('/predict', predict_roi, methods=['POST']),
+    Route('/exit', predict_exit, methods=['POST']),
+    Route('/batch_predict', batch_predict, methods=['POST']),
+    Route('/batch_exit', batch_exit, methods=['POST']),
+    Route('/predict_mint', predict_mint, methods=['POST']),
+    Route('/batch_predict_mint', batch_predict_mint, methods=['POST']),
+    Route('/retrain', retrain, methods=['POST']),
+    Route('/retrain/status', retrain_status, methods=['GET']),
+])
+
+if __name__ == '__main__':
+    import uvicorn
+    port = int(os.environ.get('AI_PORT', 8000))
+    uvicorn.run("serve_asgi:app", host='0.0.0.0', port=port, workers=int(os.environ.get('WORKERS', 1)))
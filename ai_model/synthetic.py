@@ -0,0 +1,125 @@
+# Génération vectorisée de données synthétiques (entraînement à froid, tests de charge)
+#
+#   python synthetic.py --kind roi --rows 10000000 --seed 42 --output roi.parquet
+#
+# Chaque générateur produit des colonnes entières avec numpy.random.Generator :
+# même graine et même taille de bloc => mêmes données.
+import argparse
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from dataset import FORMATS, TrainingDataWriter, detect_format
+
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+EXIT_REASONS = np.array(['peak', 'roi_target', 'stagnation', 'stop_loss'])
+
+
+def _rng(seed):
+    return seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+
+
+def roi_per_sec(time_since_launch, holders, volatility, creator_score, noise):
+    """ROI/sec synthétique en fonction des features (formule partagée par tous les générateurs)"""
+    return 0.001 * (
+        (1 - volatility) * 2 +
+        (holders / 100) * 0.5 +
+        creator_score * 3 -
+        (time_since_launch / 100) * 0.5 +
+        noise
+    )
+
+
+def _token_features(rng, n):
+    time_since_launch = rng.uniform(10, 300, n)
+    holders = rng.integers(10, 1001, n)
+    volatility = rng.uniform(0.1, 0.5, n)
+    creator_score = rng.uniform(0.7, 1.0, n)
+    return {
+        "time_since_launch": time_since_launch,
+        "holders": holders,
+        "volatility": volatility,
+        "creator_score": creator_score,
+        "roi_per_sec": roi_per_sec(time_since_launch, holders, volatility, creator_score,
+                                   rng.uniform(-0.01, 0.01, n)),
+    }
+
+
+def roi_samples(n, seed=None, start=0):
+    """Échantillons du modèle ROI/sec (train_model.py)"""
+    return pd.DataFrame(_token_features(_rng(seed), n))
+
+
+def exit_samples(n, seed=None, start=0):
+    """Échantillons du modèle de sortie : sortir si le ROI atteint 90% du ROI max futur"""
+    rng = _rng(seed)
+    time_since_buy = rng.uniform(10, 500, n)
+    roi = rng.uniform(-0.5, 5.0, n)
+    creator_score = rng.uniform(0.7, 1.0, n)
+    roi_max_future = roi + rng.uniform(-0.1, 0.5, n)
+    return pd.DataFrame({
+        "time_since_buy": time_since_buy,
+        "roi": roi,
+        "roi_per_sec": roi / time_since_buy,
+        "creator_score": creator_score,
+        "exit_now": (roi >= roi_max_future * 0.9).astype(np.int64),
+        "roi_max_future": roi_max_future,
+    })
+
+
+def training_samples(n, seed=None, start=0):
+    """Échantillons au format d'export du collecteur (mint, symbol, date...)"""
+    rng = _rng(seed)
+    features = _token_features(rng, n)
+    time_held = rng.uniform(20, 200, n)
+    exit_now = (rng.random(n) > 0.7).astype(np.int64)
+    exit_label = EXIT_REASONS[rng.integers(0, len(EXIT_REASONS), n)]
+    ids = pd.Series(np.arange(start, start + n)).astype(str)
+    return pd.DataFrame({
+        "mint": "synthetic_" + ids,
+        "symbol": "SYN_" + ids,
+        **features,
+        "roi": features["roi_per_sec"] * time_held,
+        "time_held": time_held,
+        "exit_now": exit_now,
+        "exit_label": exit_label,
+        "date": datetime.now().strftime('%Y-%m-%d'),
+    })
+
+
+KINDS = {
+    "roi": roi_samples,
+    "exit": exit_samples,
+    "training": training_samples,
+}
+
+
+def write_samples(kind, path, n, seed=None, fmt=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Écrit `n` échantillons `kind` dans `path` (JSONL, Parquet ou Arrow) par blocs de `chunk_size`"""
+    rng = _rng(seed)
+    generate = KINDS[kind]
+    with TrainingDataWriter(path, fmt or detect_format(path)) as writer:
+        for start in range(0, n, chunk_size):
+            writer.write(generate(min(chunk_size, n - start), rng, start))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic training data')
+    parser.add_argument('--kind', choices=list(KINDS), default='training')
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--format', choices=list(FORMATS), default=None,
+                        help='Output format (default: guessed from the output path)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    write_samples(args.kind, args.output, args.rows, args.seed, args.format, args.chunk_size)
+    print(f"{args.rows} échantillons {args.kind} écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
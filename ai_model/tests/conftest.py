@@ -0,0 +1,5 @@
+# Les modules de ai_model sont des scripts à plat : on les importe depuis le répertoire parent
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
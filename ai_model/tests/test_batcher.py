@@ -0,0 +1,65 @@
+# Micro-batching : une requête isolée part sans attendre, les requêtes concurrentes sont regroupées
+import threading
+import time
+
+import numpy as np
+
+from batcher import MicroBatcher
+
+
+def test_lone_request_is_dispatched_without_waiting_the_window():
+    batcher = MicroBatcher(lambda X: X.sum(axis=1), window_ms=500)
+
+    start = time.perf_counter()
+    assert batcher.submit([1.0, 2.0]).result(timeout=5) == 3.0
+    assert time.perf_counter() - start < 0.25
+
+    # Même chose une fois le thread démarré
+    start = time.perf_counter()
+    assert batcher.submit([4.0, 5.0]).result(timeout=5) == 9.0
+    assert time.perf_counter() - start < 0.25
+
+
+def test_concurrent_requests_are_coalesced():
+    release = threading.Event()
+    sizes = []
+
+    def predict(X):
+        sizes.append(len(X))
+        # Le premier appel bloque le temps que les autres requêtes s'accumulent
+        if len(sizes) == 1:
+            release.wait(5)
+        return X[:, 0] * 2
+
+    batcher = MicroBatcher(predict, window_ms=50, max_rows=64)
+    first = batcher.submit([0.0])
+    while not sizes:
+        time.sleep(0.001)
+    futures = [batcher.submit([float(i)]) for i in range(1, 11)]
+    release.set()
+
+    assert first.result(timeout=5) == 0.0
+    assert [future.result(timeout=5) for future in futures] == [2.0 * i for i in range(1, 11)]
+    assert sizes == [1, 10]
+
+
+def test_batches_are_capped_at_max_rows():
+    release = threading.Event()
+    sizes = []
+
+    def predict(X):
+        sizes.append(len(X))
+        if len(sizes) == 1:
+            release.wait(5)
+        return np.zeros(len(X))
+
+    batcher = MicroBatcher(predict, window_ms=50, max_rows=4)
+    futures = [batcher.submit([0.0])]
+    while not sizes:
+        time.sleep(0.001)
+    futures += [batcher.submit([0.0]) for _ in range(10)]
+    release.set()
+
+    for future in futures:
+        future.result(timeout=5)
+    assert sizes == [1, 4, 4, 2]
@@ -0,0 +1,111 @@
+# Parité des noyaux compilés avec sklearn
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingClassifier, HistGradientBoostingClassifier
+from sklearn.linear_model import Ridge
+from sklearn.preprocessing import StandardScaler
+
+from compiled_model import (LinearKernel, TreeEnsembleKernel, build_kernel, compile_gbm, compile_hgb,
+                            compile_linear, write_kernel)
+from synthetic import exit_samples, roi_samples
+
+ROI_FEATURES = ["time_since_launch", "holders", "volatility", "creator_score"]
+EXIT_FEATURES = ["time_since_buy", "roi", "roi_per_sec", "creator_score"]
+
+
+def assert_parity(actual, expected):
+    np.testing.assert_allclose(actual, expected, rtol=1e-5, atol=1e-9)
+
+
+@pytest.fixture(scope="module")
+def roi_data():
+    df = roi_samples(2000, seed=1)
+    return df[ROI_FEATURES].to_numpy(dtype=np.float64), df["roi_per_sec"].to_numpy()
+
+
+@pytest.fixture(scope="module")
+def exit_data():
+    df = exit_samples(2000, seed=2)
+    return df[EXIT_FEATURES].to_numpy(dtype=np.float64), df["exit_now"].to_numpy()
+
+
+def test_linear_kernel_matches_ridge_with_scaler(roi_data):
+    X, y = roi_data
+    scaler = StandardScaler().fit(X)
+    model = Ridge(alpha=0.5).fit(scaler.transform(X), y)
+
+    kernel = LinearKernel(compile_linear(model, scaler))
+
+    assert_parity(kernel.predict(X), model.predict(scaler.transform(X)))
+
+
+def test_linear_kernel_without_scaler(roi_data):
+    X, y = roi_data
+    model = Ridge(alpha=0.5).fit(X, y)
+
+    assert_parity(LinearKernel(compile_linear(model)).predict(X), model.predict(X))
+
+
+@pytest.mark.parametrize("max_depth", [1, 3, 6])
+def test_gbm_kernel_matches_predict_proba(exit_data, max_depth):
+    X, y = exit_data
+    model = GradientBoostingClassifier(n_estimators=30, max_depth=max_depth, random_state=0).fit(X, y)
+
+    kernel = TreeEnsembleKernel(compile_gbm(model))
+
+    assert_parity(kernel.predict(X), model.predict_proba(X)[:, 1])
+
+
+def test_hgb_kernel_matches_predict_proba(exit_data):
+    X, y = exit_data
+    model = HistGradientBoostingClassifier(max_iter=50, max_depth=4, max_leaf_nodes=15,
+                                           early_stopping=False, random_state=0).fit(X, y)
+
+    kernel = TreeEnsembleKernel(compile_hgb(model))
+
+    assert kernel.backend == "hgb"
+    assert_parity(kernel.predict(X), model.predict_proba(X)[:, 1])
+
+
+def test_hgb_kernel_handles_missing_values(exit_data):
+    X, y = exit_data
+    rng = np.random.default_rng(3)
+    # Valeurs manquantes à l'entraînement : certains noeuds les envoient à droite
+    X_missing = X.copy()
+    X_missing[rng.random(X.shape) < 0.1] = np.nan
+    model = HistGradientBoostingClassifier(max_iter=50, max_depth=4, early_stopping=False,
+                                           random_state=0).fit(X_missing, y)
+
+    kernel = TreeEnsembleKernel(compile_hgb(model))
+
+    X_check = X.copy()
+    X_check[rng.random(X.shape) < 0.2] = np.nan
+    assert_parity(kernel.predict(X_check), model.predict_proba(X_check)[:, 1])
+
+
+def test_too_deep_trees_are_not_compiled(exit_data):
+    X, y = exit_data
+    model = GradientBoostingClassifier(n_estimators=5, max_depth=8, random_state=0).fit(X, y)
+
+    with pytest.raises(ValueError, match="too deep"):
+        compile_gbm(model)
+    assert build_kernel(lambda: compile_gbm(model), lambda X: model.predict_proba(X)[:, 1], X) is None
+
+
+def test_build_kernel_rejects_divergent_kernel(roi_data):
+    X, y = roi_data
+    model = Ridge().fit(X, y)
+
+    assert build_kernel(lambda: compile_linear(model), lambda X: model.predict(X) + 1.0, X) is None
+
+
+def test_write_kernel_removes_stale_kernel(tmp_path, roi_data):
+    X, y = roi_data
+    model = Ridge().fit(X, y)
+    path = tmp_path / "roi_kernel.joblib"
+
+    write_kernel(build_kernel(lambda: compile_linear(model), model.predict, X), path)
+    assert path.exists()
+
+    write_kernel(None, path)
+    assert not path.exists()
@@ -0,0 +1,186 @@
+# Collecte des quotes Jupiter contre un serveur HTTP local : retries, 429, débit, réponses invalides ;
+# import des trades Redis (fakeredis + SQLite) : pagination par score et watermark
+import asyncio
+import importlib
+import json
+import os
+import time
+
+import pytest
+from aiohttp import web
+from sqlalchemy import text
+
+
+@pytest.fixture(scope="module")
+def data_collector(tmp_path_factory):
+    # L'import configure un FileHandler dans le répertoire courant
+    previous = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("collector"))
+    try:
+        yield importlib.import_module("data_collector")
+    finally:
+        os.chdir(previous)
+
+
+class StubJupiter:
+    """Répond selon un scénario par token : liste de (status, corps) consommée à chaque requête"""
+
+    def __init__(self, scenarios):
+        self.scenarios = {mint: list(responses) for mint, responses in scenarios.items()}
+        self.requests = []
+
+    async def quote(self, request):
+        mint = request.query["outputMint"]
+        self.requests.append((mint, time.monotonic()))
+        responses = self.scenarios.get(mint) or [(200, '{"inAmount": 1000000000, "outAmount": 5}')]
+        status, body = responses.pop(0) if len(responses) > 1 else responses[0]
+        return web.Response(status=status, text=body, content_type="application/json")
+
+    def count(self, mint):
+        return sum(1 for requested, _ in self.requests if requested == mint)
+
+
+def fetch(data_collector, scenarios, tokens, **settings):
+    """Lance un serveur local et collecte les quotes de `tokens` ; renvoie (quotes, stub, durée)"""
+    stub = StubJupiter(scenarios)
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/quote", stub.quote)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            collector = data_collector.DataCollector(tokens=tokens)
+            collector.jupiter_api = f"http://127.0.0.1:{port}"
+            collector.retry_backoff = 0.05
+            collector.rate_limit = 0
+            for name, value in settings.items():
+                setattr(collector, name, value)
+            start = time.monotonic()
+            quotes = await collector.fetch_quotes(tokens)
+            return quotes, time.monotonic() - start
+        finally:
+            await runner.cleanup()
+
+    quotes, elapsed = asyncio.run(run())
+    return quotes, stub, elapsed
+
+
+def test_server_errors_are_retried(data_collector):
+    quotes, stub, _ = fetch(data_collector, {"A": [(500, "oops"), (502, "oops"), (200, '{"outAmount": 7}')]}, ["A"])
+
+    assert quotes == [{"outAmount": 7}]
+    assert stub.count("A") == 3
+
+
+def test_gives_up_after_max_retries(data_collector):
+    quotes, stub, _ = fetch(data_collector, {"A": [(503, "down")]}, ["A"], max_retries=2)
+
+    assert quotes == [None]
+    assert stub.count("A") == 3
+
+
+def test_client_errors_are_not_retried(data_collector):
+    quotes, stub, _ = fetch(data_collector, {"A": [(404, "{}")]}, ["A"])
+
+    assert quotes == [None]
+    assert stub.count("A") == 1
+
+
+def test_429_backs_off_exponentially(data_collector):
+    quotes, stub, _ = fetch(data_collector, {"A": [(429, "slow down"), (429, "slow down"), (200, '{"outAmount": 1}')]},
+                            ["A"], retry_backoff=0.1)
+
+    times = [at for _, at in stub.requests]
+    assert quotes == [{"outAmount": 1}]
+    # Attentes de 0.1s puis 0.2s entre les essais
+    assert times[1] - times[0] >= 0.1
+    assert times[2] - times[1] >= 0.2
+
+
+def test_malformed_body_skips_only_that_token(data_collector):
+    quotes, stub, _ = fetch(data_collector, {"BAD": [(200, "{not json")]}, ["A", "BAD", "C"])
+
+    assert quotes[0] is not None and quotes[2] is not None
+    assert quotes[1] is None
+    assert stub.count("BAD") == 1
+
+
+def test_rate_limit_spaces_requests(data_collector):
+    # Rafale de 20 requêtes au plus, puis 20 par seconde : 30 tokens prennent au moins 0.5s
+    quotes, stub, elapsed = fetch(data_collector, {}, [f"T{i}" for i in range(30)], rate_limit=20)
+
+    assert all(quote is not None for quote in quotes)
+    assert elapsed >= (30 - 20) / 20 * 0.9
+    times = sorted(at for _, at in stub.requests)
+    assert times[-1] - times[20] >= (30 - 21) / 20 * 0.9
+
+
+def trades_collector(data_collector, tmp_path, monkeypatch, page_size=3):
+    """Collecteur sur SQLite et fakeredis, avec des pages de `page_size` trades"""
+    import fakeredis
+
+    monkeypatch.setenv("POSTGRES_URL", f"sqlite:///{tmp_path / 'trades.db'}")
+    monkeypatch.setenv("TRAINING_DATA_PATH", str(tmp_path / "training.jsonl"))
+    monkeypatch.setenv("COLLECTOR_PAGE_SIZE", str(page_size))
+    collector = data_collector.DataCollector()
+    collector.redis_client = fakeredis.FakeRedis()
+    return collector
+
+
+def add_trade(client, i, sell_time, payload=True):
+    if payload:
+        client.set(f"trade:{i}", json.dumps({"token": f"mint_{i}", "roi": 0.1, "buy_time": sell_time - 5,
+                                             "sell_time": sell_time}))
+    client.zadd("exits", {f"trade:{i}": sell_time})
+
+
+def imported(collector):
+    with collector.engine.connect() as conn:
+        return {row[0] for row in conn.execute(text("SELECT trade_key FROM trade_data"))}
+
+
+def test_trades_are_paged_by_score_across_ties(data_collector, tmp_path, monkeypatch):
+    collector = trades_collector(data_collector, tmp_path, monkeypatch)
+    # Pages de 3 sur des séries d'ex aequo plus longues qu'une page
+    scores = [1000, 1000, 1000, 1000, 1000, 1001, 1002, 1002, 1002, 1003]
+    for i, score in enumerate(scores):
+        add_trade(collector.redis_client, i, score)
+
+    assert collector.collect_trade_results()
+
+    assert imported(collector) == {f"trade:{i}" for i in range(len(scores))}
+    assert collector.get_exits_watermark() == 1003
+
+
+def test_missing_payload_holds_the_watermark(data_collector, tmp_path, monkeypatch):
+    collector = trades_collector(data_collector, tmp_path, monkeypatch)
+    client = collector.redis_client
+    for i in range(8):
+        add_trade(client, i, 1000 + i, payload=i != 2)
+
+    assert collector.collect_trade_results()
+    assert "trade:2" not in imported(collector)
+    assert collector.get_exits_watermark() == 1002
+
+    # Le JSON arrive après coup : le trade est importé au passage suivant
+    add_trade(client, 2, 1002)
+    assert collector.collect_trade_results()
+    assert imported(collector) == {f"trade:{i}" for i in range(8)}
+    assert collector.get_exits_watermark() == 1007
+
+
+def test_long_missing_payload_is_abandoned(data_collector, tmp_path, monkeypatch):
+    collector = trades_collector(data_collector, tmp_path, monkeypatch)
+    collector.missing_grace = 60
+    add_trade(collector.redis_client, 0, 1000, payload=False)
+    for i in range(1, 5):
+        add_trade(collector.redis_client, i, 2000 + i)
+
+    assert collector.collect_trade_results()
+
+    assert imported(collector) == {f"trade:{i}" for i in range(1, 5)}
+    assert collector.get_exits_watermark() == 2004
@@ -0,0 +1,62 @@
+# Métriques Prometheus : séries par thread, séries groupées et rendu texte
+import threading
+
+import pytest
+
+from metrics import MetricsRegistry, SeriesGroup
+
+
+def run_threads(target, n=8):
+    threads = [threading.Thread(target=target) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_grouped_histograms_render_like_plain_ones():
+    registry = MetricsRegistry()
+    plain = registry.histogram('plain_seconds', 'Plain', ('endpoint',), buckets=(0.1, 1.0))
+    grouped = registry.histogram('grouped_seconds', 'Grouped', ('endpoint', 'stage'), buckets=(0.1, 1.0))
+    group = SeriesGroup()
+    decode, score = grouped.grouped(group, 'predict', 'decode'), grouped.grouped(group, 'predict', 'score')
+
+    def work():
+        for _ in range(100):
+            plain.labels('predict').observe(0.5)
+            shard = group.shard()
+            decode.observe_into(shard, 0.05)
+            score.observe_into(shard, 2.0)
+
+    run_threads(work)
+
+    text = registry.render()
+    assert 'plain_seconds_bucket{endpoint="predict",le="1.0"} 800' in text
+    assert 'grouped_seconds_bucket{endpoint="predict",stage="decode",le="0.1"} 800' in text
+    assert 'grouped_seconds_bucket{endpoint="predict",stage="score",le="1.0"} 0' in text
+    assert 'grouped_seconds_count{endpoint="predict",stage="score"} 800' in text
+    assert decode.snapshot()[1] == pytest.approx(800 * 0.05)
+
+
+def test_finished_threads_release_their_group_shard():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('seconds', 'Seconds', ('endpoint',))
+    group = SeriesGroup()
+    series = histogram.grouped(group, 'predict')
+
+    run_threads(lambda: series.observe(0.001), n=50)
+
+    assert len(group._shards) == 0
+    counts, total = series.snapshot()
+    assert sum(counts) == 50
+    assert total == pytest.approx(0.05)
+
+
+def test_series_cannot_join_a_group_after_observations():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('seconds', 'Seconds', ('stage',))
+    group = SeriesGroup()
+    histogram.grouped(group, 'decode').observe(0.001)
+
+    with pytest.raises(RuntimeError):
+        histogram.grouped(group, 'score')
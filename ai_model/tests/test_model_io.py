@@ -0,0 +1,48 @@
+# Écritures atomiques : contenu publié et droits des fichiers
+import json
+import os
+import stat
+
+import pytest
+
+import model_io
+
+
+@pytest.fixture
+def umask():
+    previous = os.umask(0o022)
+    model_io._UMASK, saved = 0o022, model_io._UMASK
+    yield 0o022
+    model_io._UMASK = saved
+    os.umask(previous)
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_atomic_dump_uses_umask_mode(tmp_path, umask):
+    path = model_io.atomic_dump({"a": 1}, tmp_path / "roi_model.joblib")
+
+    assert mode(path) == 0o644
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_atomic_copy_does_not_keep_private_source_mode(tmp_path, umask):
+    src = tmp_path / "src.joblib"
+    src.write_bytes(b"model")
+    os.chmod(src, 0o600)
+
+    dst = model_io.atomic_copy(src, tmp_path / "dst.joblib")
+
+    assert dst.read_bytes() == b"model"
+    assert mode(dst) == 0o644
+
+
+def test_update_metrics_merges_and_uses_umask_mode(tmp_path, umask):
+    path = tmp_path / "metrics.json"
+    model_io.update_metrics(path, {"roi": {"r2": 0.5}})
+    model_io.update_metrics(path, {"exit": {"auc": 0.7}})
+
+    assert json.loads(path.read_text()) == {"roi": {"r2": 0.5}, "exit": {"auc": 0.7}}
+    assert mode(path) == 0o644
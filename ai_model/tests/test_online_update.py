@@ -0,0 +1,77 @@
+# Mises à jour incrémentales : publication via staging et validation quand le service sert models/production
+import json
+from datetime import datetime
+
+import joblib
+import pytest
+from sklearn.linear_model import Ridge
+from sklearn.preprocessing import StandardScaler
+
+import online_update
+import train_model
+from synthetic import roi_samples
+
+# Décalage des cibles du modèle de production (ordre de grandeur : roi_per_sec ~ 0.005)
+OFFSET = 0.01
+
+
+class StubCollector:
+    """Trades sortis depuis le watermark, sans base"""
+
+    def __init__(self, df):
+        self.df = df
+
+    def latest_exit_time(self):
+        return datetime(2026, 1, 1)
+
+    def iter_training_frames(self, since=None, until=None):
+        yield self.df
+
+
+@pytest.fixture
+def production(tmp_path, monkeypatch):
+    """models/production avec un modèle ROI appris sur des cibles décalées de OFFSET"""
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "models" / "production"
+    path.mkdir(parents=True)
+    monkeypatch.setenv("MODEL_DIR", str(path))
+    monkeypatch.setenv("VALIDATION_DATA_PATH", str(tmp_path / "validation.csv"))
+    monkeypatch.setattr(online_update, "ROI_EPOCHS", 5)
+
+    roi_samples(500, seed=3).to_csv(tmp_path / "validation.csv", index=False)
+    df = roi_samples(1000, seed=1)
+    scaler = StandardScaler().fit(df[train_model.FEATURES])
+    model = Ridge().fit(scaler.transform(df[train_model.FEATURES]), df[train_model.TARGET] + OFFSET)
+    joblib.dump(model, path / "roi_model.joblib")
+    joblib.dump(scaler, path / "roi_scaler.joblib")
+    return path
+
+
+def new_trades(offset):
+    df = roi_samples(300, seed=2)
+    df[train_model.TARGET] += offset
+    return df
+
+
+def test_update_that_beats_production_is_promoted(production):
+    before = (production / "roi_model.joblib").read_bytes()
+
+    summary = online_update.run(collector=StubCollector(new_trades(0.0)))
+
+    assert summary is not None and summary["validation"]["roi"]["ok"]
+    assert "exit" not in summary["validation"]
+    assert (production / "roi_model.joblib").read_bytes() != before
+    state = json.loads((production / online_update.STATE_FILE).read_text())
+    assert state["watermarks"]["roi"] == datetime(2026, 1, 1).isoformat()
+
+
+def test_update_that_degrades_production_is_not_published(production):
+    before = (production / "roi_model.joblib").read_bytes()
+
+    assert online_update.run(collector=StubCollector(new_trades(2 * OFFSET))) is None
+
+    assert (production / "roi_model.joblib").read_bytes() == before
+    assert not (production / "roi_kernel.joblib").exists()
+    assert not (production / online_update.STATE_FILE).exists()
+    metrics = json.loads((production / "metrics.json").read_text())
+    assert metrics["online_rejected"]["reason"] == "staging models do not beat production"
@@ -34,6 +34,8 @@ if [ -f "models/roi_model.joblib" ] && [ -f "models/exit_model.joblib" ]; then
     echo "📊 Statistiques:"
     echo "   - ROI model: $(du -h models/roi_model.joblib | cut -f1)"
     echo "   - Exit model: $(du -h models/exit_model.joblib | cut -f1)"
+    [ -f "models/roi_kernel.joblib" ] && echo "   - ROI kernel: $(du -h models/roi_kernel.joblib | cut -f1)"
+    [ -f "models/exit_kernel.joblib" ] && echo "   - Exit kernel: $(du -h models/exit_kernel.joblib | cut -f1)"
 else
     echo "❌ Erreur: Certains modèles n'ont pas été créés"
     exit 1
@@ -1,15 +1,30 @@
 # Entraîne le modèle principal de prédiction ROI/sec
-import json
-import pandas as pd
 from sklearn.linear_model import Ridge
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
-from joblib import dump
+from sklearn.pipeline import Pipeline
+from model_io import atomic_dump, update_metrics
+from model_search import add_search_arguments, search_model, search_options, search_summary
+from dataset import load_columns
+from compiled_model import build_kernel, compile_linear, write_kernel
+from synthetic import write_samples
+from profiling import add_profile_argument, configure as configure_profiling, stage
+import argparse
 import os
+from datetime import datetime
 from pathlib import Path
 
+FEATURES = ["time_since_launch", "holders", "volatility", "creator_score"]
+TARGET = "roi_per_sec"
+
+# Espace de recherche (--search) ; le scaler est refait par pli dans le pipeline
+SEARCH_SPACE = {
+    "ridge__alpha": [0.001, 0.01, 0.03, 0.1, 0.3, 0.5, 1.0, 3.0, 10.0, 30.0, 100.0],
+    "ridge__fit_intercept": [True, False],
+}
+
 def load_data(path=None):
-    """Charge les données d'entraînement depuis un fichier JSONL"""
+    """Charge les colonnes utiles des données d'entraînement (JSONL lu en flux)"""
     # Utiliser le chemin d'environnement ou valeur par défaut
     if path is None:
         path = os.getenv('TRAINING_DATA_PATH', 'training_data.jsonl')
@@ -19,92 +34,95 @@ def load_data(path=None):
         # Créer un fichier exemple si absent
         create_example_data(path)
     
-    rows = []
-    with open(path) as f:
-        for line in f:
-            if line.strip():  # Ignorer les lignes vides
-                try:
-                    rows.append(json.loads(line))
-                except json.JSONDecodeError:
-                    print(f"Warning: Skipping invalid JSON line")
-                    continue
-    
-    return pd.DataFrame(rows)
+    return load_columns(path, FEATURES + [TARGET])
 
 def create_example_data(path):
     """Crée des données d'exemple pour l'entraînement"""
-    import random
-    
     print(f"Creating example training data at {path}")
-    
-    with open(path, 'w') as f:
-        for i in range(1000):
-            # Générer des données réalistes
-            time_since_launch = random.uniform(10, 300)
-            holders = random.randint(10, 1000)
-            volatility = random.uniform(0.1, 0.5)
-            creator_score = random.uniform(0.7, 1.0)
-            
-            # Générer un ROI/sec réaliste basé sur les features
-            roi_per_sec = 0.001 * (
-                (1 - volatility) * 2 +
-                (holders / 100) * 0.5 +
-                creator_score * 3 -
-                (time_since_launch / 100) * 0.5 +
-                random.uniform(-0.01, 0.01)
-            )
-            
-            data = {
-                "time_since_launch": time_since_launch,
-                "holders": holders,
-                "volatility": volatility,
-                "creator_score": creator_score,
-                "roi_per_sec": roi_per_sec
-            }
-            
-            f.write(json.dumps(data) + '\n')
+    write_samples("roi", path, 1000)
 
-def train():
-    """Entraîne le modèle ROI/sec"""
-    # Charger les données
-    df = load_data()
+def train(search=None):
+    """Entraîne le modèle ROI/sec.
     
-    if len(df) < 10:
-        print("Warning: Not enough data for training. Generated example data.")
-        df = load_data()  # Reloader après création
+    `search` (voir model_search.search_options) remplace les hyperparamètres
+    fixes par une recherche ; le meilleur candidat est réentraîné sur tout
+    le jeu d'entraînement.
+    """
+    with stage("load"):
+        # Charger les données
+        df = load_data()
     
-    # Définir les features et target
-    features = ["time_since_launch", "holders", "volatility", "creator_score"]
-    target = "roi_per_sec"
+        if len(df) < 10:
+            print("Warning: Not enough data for training. Generated example data.")
+            df = load_data()  # Reloader après création
     
-    # Préparer les données
-    X = df[features]
-    y = df[target]
+        # Définir les features et target
+        features = FEATURES
+        target = TARGET
     
-    # Diviser en train/test
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        # Préparer les données (lignes incomplètes ignorées)
+        df = df.dropna(subset=[c for c in features + [target] if c in df.columns])
+        X = df[features]
+        y = df[target]
     
-    # Standardiser les features
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
+        # Diviser en train/test
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
     
-    # Entraîner le modèle
-    model = Ridge(alpha=0.5)
-    model.fit(X_train_scaled, y_train)
+    with stage("fit"):
+        result = None
+        if search:
+            pipeline = Pipeline([("scaler", StandardScaler()), ("ridge", Ridge())])
+            result = search_model(pipeline, SEARCH_SPACE, X_train, y_train, **search)
+            scaler = result["estimator"].named_steps["scaler"]
+            model = result["estimator"].named_steps["ridge"]
+        else:
+            # Standardiser les features
+            scaler = StandardScaler()
+            X_train_scaled = scaler.fit_transform(X_train)
+        
+            # Entraîner le modèle
+            model = Ridge(alpha=0.5)
+            model.fit(X_train_scaled, y_train)
     
     # Évaluer
+    X_test_scaled = scaler.transform(X_test)
     score = model.score(X_test_scaled, y_test)
     print(f"R² Score: {score:.3f}")
     
-    # Sauvegarder le modèle
-    model_path = Path("models") if os.path.exists("models") else Path(".")
-    dump(model, model_path / "roi_model.joblib")
-    dump(scaler, model_path / "roi_scaler.joblib")
+    with stage("export"):
+        # Noyau compact (scaler replié dans les coefficients) utilisé par serve.py,
+        # vérifié avant d'écrire quoi que ce soit
+        kernel = build_kernel(
+            lambda: compile_linear(model, scaler),
+            lambda X: model.predict(scaler.transform(X)),
+            X_test
+        )
+    
+        # Sauvegarder le modèle
+        model_path = Path("models") if os.path.exists("models") else Path(".")
+        atomic_dump(model, model_path / "roi_model.joblib")
+        atomic_dump(scaler, model_path / "roi_scaler.joblib")
+        write_kernel(kernel, model_path / "roi_kernel.joblib")
+    
+        update_metrics(model_path / "metrics.json", {
+            "roi": {
+                "r2": float(score),
+                "model": type(model).__name__,
+                "params": model.get_params(),
+                "n_train": len(X_train),
+                "trained_at": datetime.now().isoformat(),
+                "search": search_summary(result) if result else None
+            }
+        })
     
     print(f"✅ Modèle ROI/sec entraîné et sauvegardé dans {model_path}")
     
     return model, scaler
 
 if __name__ == "__main__":
-    train()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Train the ROI/sec model')
+    add_search_arguments(parser)
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    configure_profiling(args.profile, 'train_model')
+    train(search=search_options(args))
\ No newline at end of file
@@ -21,6 +21,9 @@ class TrainingScheduler:
         self.min_accuracy = 0.80    # Seuil de performance minimale
         self.last_training = None
         
+        # Mises à jour incrémentales entre deux réentraînements (0 = désactivées)
+        self.online_update_minutes = int(os.getenv('ONLINE_UPDATE_MINUTES', '15'))
+        
     def check_data_freshness(self):
         """Vérifie si assez de nouvelles données sont disponibles"""
         trades_count = self.redis.zcard('exits')
@@ -55,6 +58,7 @@ class TrainingScheduler:
     def run_training(self):
         """Lance le processus d'entraînement"""
         print(f"[{datetime.now()}] Début de l'entraînement...")
+        started = datetime.now()
         
         try:
             # 1. Collecter les nouvelles données
@@ -77,6 +81,10 @@ class TrainingScheduler:
             self.redis.set('last_train_trades', trades_count)
             self.redis.set('last_train_time', datetime.now().timestamp())
             
+            # 5. Les trades exportés sont appris : repartir de là pour les mises à jour incrémentales
+            from online_update import reset_watermark
+            reset_watermark(started)
+            
             print(f"[{datetime.now()}] Entraînement terminé avec succès!")
             
         except subprocess.CalledProcessError as e:
@@ -84,6 +92,14 @@ class TrainingScheduler:
         except Exception as e:
             print(f"Erreur inattendue: {e}")
     
+    def run_online_update(self):
+        """Intègre les derniers trades sans réentraînement complet"""
+        try:
+            subprocess.run(["python", "data_collector.py", "--mode", "trades"], check=True)
+            subprocess.run(["python", "online_update.py"], check=True)
+        except subprocess.CalledProcessError as e:
+            print(f"Erreur pendant la mise à jour incrémentale: {e}")
+    
     def should_train(self):
         """Détermine si un entraînement est nécessaire"""
         # Entraînement quotidien
@@ -115,6 +131,10 @@ class TrainingScheduler:
         
         schedule.every().hour.do(check_and_train)
         
+        # Mises à jour incrémentales entre deux réentraînements complets
+        if self.online_update_minutes > 0:
+            schedule.every(self.online_update_minutes).minutes.do(self.run_online_update)
+        
         print(f"Planificateur démarré. Prochaine vérification: {schedule.idle_seconds()}s")
         
         while True:
@@ -5,8 +5,11 @@ import pandas as pd
 import numpy as np
 from sklearn.metrics import accuracy_score, mean_squared_error
 from pathlib import Path
+from datetime import datetime
 import os
 import shutil
+from model_io import atomic_copy
+from dataset import load_columns
 
 class ModelValidator:
     def __init__(self):
@@ -19,6 +22,13 @@ class ModelValidator:
         for dir_path in [self.staging_dir, self.production_dir, self.backup_dir]:
             dir_path.mkdir(parents=True, exist_ok=True)
     
+    def load_test_data(self, test_data_path, columns):
+        """Charge les données de test : CSV, JSONL, Parquet ou Arrow (lus sans parsing JSON)"""
+        if str(test_data_path).endswith('.csv'):
+            return pd.read_csv(test_data_path, usecols=lambda c: c in columns)
+        df = load_columns(test_data_path, columns)
+        return df.dropna(subset=[c for c in columns if c in df.columns])
+    
     def validate_roi_model(self, test_data_path='test_data.csv'):
         """Valide le modèle ROI/sec"""
         # Charger les modèles
@@ -27,8 +37,8 @@ class ModelValidator:
         scaler = joblib.load(self.staging_dir / "roi_scaler.joblib")
         
         # Charger les données de test
-        df_test = pd.read_csv(test_data_path)
         features = ["time_since_launch", "holders", "volatility", "creator_score"]
+        df_test = self.load_test_data(test_data_path, features + ["roi_per_sec"])
         X_test = df_test[features]
         y_test = df_test["roi_per_sec"]
         
@@ -57,11 +67,14 @@ class ModelValidator:
         staging_model = joblib.load(self.staging_dir / "exit_model.joblib")
         
         # Charger les données de test
-        df_test = pd.read_csv(test_data_path)
         features = ["time_since_buy", "roi", "roi_per_sec", "creator_score"]
+        df_test = self.load_test_data(test_data_path, features + ["exit_now"])
         X_test = df_test[features]
         y_test = df_test["exit_now"]
         
+        # gbm ou hgb : même interface predict()
+        print(f"Production: {type(production_model).__name__}, Staging: {type(staging_model).__name__}")
+        
         # Prédictions
         prod_predictions = production_model.predict(X_test)
         staging_predictions = staging_model.predict(X_test)
@@ -79,6 +92,32 @@ class ModelValidator:
         
         return staging_accuracy > prod_accuracy, improvement
     
+    def stage_models(self, source_dir):
+        """Remplace le contenu de staging par les modèles de `source_dir`"""
+        for model_file in self.staging_dir.glob("*.joblib"):
+            model_file.unlink()
+        for model_file in Path(source_dir).glob("*.joblib"):
+            atomic_copy(model_file, self.staging_dir / model_file.name)
+    
+    def validate_staging(self, test_data_path='test_data.csv', models=("roi", "exit")):
+        """Chaque modèle de staging de `models` doit battre celui de production (rien à battre sans modèle en production).
+        
+        Renvoie (promouvable, détails par modèle).
+        """
+        results = {}
+        for name, validate in (("roi", self.validate_roi_model), ("exit", self.validate_exit_model)):
+            if name not in models:
+                continue
+            model_file = f"{name}_model.joblib"
+            if not (self.staging_dir / model_file).exists():
+                results[name] = {"ok": False, "reason": "missing from staging"}
+            elif not (self.production_dir / model_file).exists():
+                results[name] = {"ok": True, "reason": "no production model"}
+            else:
+                ok, improvement = validate(test_data_path)
+                results[name] = {"ok": bool(ok), "improvement": float(improvement)}
+        return all(result["ok"] for result in results.values()), results
+    
     def run_ab_test(self, duration_hours=24):
         """Exécute un test A/B en production"""
         # Préparer le test A/B
@@ -109,12 +148,25 @@ class ModelValidator:
         for model_file in self.production_dir.glob("*.joblib"):
             shutil.copy2(model_file, backup_subdir / model_file.name)
         
-        # Copier les modèles de staging vers production
+        # Copier les modèles de staging vers production (remplacement atomique :
+        # le service les lit en mmap et recharge à chaud)
         for model_file in self.staging_dir.glob("*.joblib"):
-            shutil.copy2(model_file, self.production_dir / model_file.name)
+            atomic_copy(model_file, self.production_dir / model_file.name)
+        self._drop_stale_kernels(self.staging_dir)
         
         print(f"Modèles promus de staging à production. Backup sauvegardé dans {backup_subdir}")
     
+    def _drop_stale_kernels(self, source_dir):
+        """Supprime de production le noyau d'un modèle copié sans noyau (non compilable).
+
+        Le service préfère le noyau au modèle sklearn : l'ancien servirait l'ancien modèle.
+        """
+        for model_file in source_dir.glob("*_model.joblib"):
+            kernel_name = model_file.name.replace("_model.joblib", "_kernel.joblib")
+            kernel = self.production_dir / kernel_name
+            if not (source_dir / kernel_name).exists() and kernel.exists():
+                kernel.unlink()
+    
     def rollback_models(self, backup_timestamp=None):
         """Restaure les modèles depuis un backup"""
         if backup_timestamp is None:
@@ -133,7 +185,8 @@ class ModelValidator:
         
         # Restaurer les modèles
         for model_file in backup_subdir.glob("*.joblib"):
-            shutil.copy2(model_file, self.production_dir / model_file.name)
+            atomic_copy(model_file, self.production_dir / model_file.name)
+        self._drop_stale_kernels(backup_subdir)
         
         print(f"Modèles restaurés depuis {backup_subdir}")
     
@@ -160,7 +213,6 @@ class ModelValidator:
         return report
 
 if __name__ == "__main__":
-    from datetime import datetime
     validator = ModelValidator()
     
     # Validation des modèles
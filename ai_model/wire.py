@@ -0,0 +1,81 @@
+# Formats d'échange des endpoints de scoring : JSON, msgpack ou float32 brut
+import json
+
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:  # msgpack est optionnel
+    msgpack = None
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+# Tableau float32 little-endian brut, 4 valeurs par ligne ; la réponse est un
+# tableau float32 d'une valeur par ligne (ROI/sec ou probabilité de sortie)
+FLOAT32 = 'application/x-float32'
+
+_ALIASES = {
+    'application/x-msgpack': MSGPACK,
+    'application/vnd.msgpack': MSGPACK,
+    'application/octet-stream': FLOAT32,
+}
+
+N_FEATURES = 4
+
+
+class WireError(Exception):
+    """Corps de requête illisible ; `status` est le code HTTP à renvoyer"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def media_type(content_type):
+    """Normalise un en-tête Content-Type (sans paramètres), JSON par défaut"""
+    media = (content_type or '').split(';')[0].strip().lower()
+    media = _ALIASES.get(media, media)
+    return media if media in (MSGPACK, FLOAT32) else JSON
+
+
+def decode(body, content_type):
+    """Décode un corps de requête en (media, données).
+
+    Les données sont un dict pour JSON/msgpack et une matrice (n, 4) float64
+    pour le format float32 brut.
+    """
+    media = media_type(content_type)
+
+    if media == FLOAT32:
+        if len(body) % (4 * N_FEATURES):
+            raise WireError(f"Invalid float32 body: expected a multiple of {4 * N_FEATURES} bytes")
+        return media, np.frombuffer(body, dtype='<f4').astype(np.float64).reshape(-1, N_FEATURES)
+
+    if media == MSGPACK:
+        if msgpack is None:
+            raise WireError("msgpack is not installed on this server", status=415)
+        try:
+            return media, msgpack.unpackb(body, raw=False) if body else None
+        except Exception:
+            raise WireError("Invalid msgpack body")
+
+    try:
+        return media, json.loads(body) if body else None
+    except ValueError:
+        raise WireError("Invalid JSON body")
+
+
+def encode(payload, media):
+    """Sérialise une réponse dans le format de la requête"""
+    if media == FLOAT32:
+        return np.asarray(payload, dtype='<f4').tobytes()
+    if media == MSGPACK:
+        return msgpack.packb(payload, use_bin_type=True)
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+
+def is_lean(query_value=None, header_value=None):
+    """Mode "lean" (pas d'écho des features) via ?lean=1 ou X-Response-Mode: lean"""
+    if query_value is not None and str(query_value).lower() in ('1', 'true', 'yes'):
+        return True
+    return (header_value or '').strip().lower() == 'lean'
@@ -29,7 +29,8 @@ CREATE TABLE IF NOT EXISTS cubi.trade_data (
     entry_time TIMESTAMP WITH TIME ZONE,
     exit_time TIMESTAMP WITH TIME ZONE,
     features JSONB,
-    exit_reason VARCHAR(64)
+    exit_reason VARCHAR(64),
+    trade_key VARCHAR(128)
 );
 
 -- Create backtesting results table
@@ -49,6 +50,9 @@ CREATE INDEX IF NOT EXISTS idx_token_mint ON cubi.token_data(mint);
 CREATE INDEX IF NOT EXISTS idx_trade_token_mint ON cubi.trade_data(token_mint);
 CREATE INDEX IF NOT EXISTS idx_trade_strategy ON cubi.trade_data(strategy_id);
 CREATE INDEX IF NOT EXISTS idx_trade_exit_time ON cubi.trade_data(exit_time);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_trade_data_trade_key ON cubi.trade_data(trade_key);
+CREATE INDEX IF NOT EXISTS ix_trade_data_token_mint_exit_time ON cubi.trade_data(token_mint, exit_time);
+CREATE INDEX IF NOT EXISTS ix_token_data_mint_created_at ON cubi.token_data(mint, created_at);
 CREATE INDEX IF NOT EXISTS idx_backtest_strategy ON cubi.backtest_results(strategy_id);
 
 -- Create views for data analysis